@@ -1,23 +1,31 @@
 import uuid
 import json
+import tempfile
 from pathlib import Path
-from datetime import datetime, timedelta
 
+import click
 from flask import Flask, request
 from flasgger import Swagger
 from flask_cors import CORS
 
-from config import Config
-from models.database import db
-from helpers.custom_response import CustomResponse
+from config import Config, engine_options
+from models.database import db, init_sqlite
+from helpers.custom_response import CustomResponse, FastJSONProvider
 
 from blueprints.commodity_blueprint import commodity_blueprint
 from blueprints.storage_blueprint import storage_blueprint
 from blueprints.image_blueprint import image_blueprint
 from blueprints.record_blueprint import record_blueprint
+from blueprints.metrics_blueprint import metrics_blueprint
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from models.commodity_model import Commodity
+from helpers import counters, image_pipeline, image_store, response_cache, search_fts, tokenizer
+from helpers.image_store import prepare_stored_images
+from helpers.search_index import rebuild_index
+from helpers.reputation import rebuild_reputations
+from helpers.migration import migrate, upgrade_database
+from helpers.pagination import InvalidCursor
+from helpers.query_plan import check_query_plans
+from helpers.jobs import JobWorker
 
 
 def get_documents(doc_path='docs'):
@@ -31,12 +39,18 @@ def get_documents(doc_path='docs'):
     return documents
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.secret_key = uuid.uuid4().hex
+    app.json = FastJSONProvider(app)
 
     app.config.from_object(Config)
+    app.config.update(config or {})
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in (config or {}):
+        # the pool options depend on the database, which config may have replaced
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     db.init_app(app)
+    migrate.init_app(app, db)
 
     Swagger(app, template=get_documents())
     CORS(
@@ -49,9 +63,35 @@ def create_app():
     app.register_blueprint(storage_blueprint, url_prefix='/api/storage')
     app.register_blueprint(image_blueprint, url_prefix='/api/image')
     app.register_blueprint(record_blueprint, url_prefix='/api/record')
+    app.register_blueprint(metrics_blueprint, url_prefix='/api/metrics')
+
+    tokenizer.init_app(app)
+    counters.init_app(app)
+    response_cache.init_app(app)
+    image_pipeline.init_app(app)
+    image_store.init_app(app)
+
+    @app.errorhandler(InvalidCursor)
+    def handle_invalid_cursor(e: InvalidCursor):
+        return CustomResponse.bad_request(str(e), {})
+
+    @app.errorhandler(Exception)
+    def handle_exception(e: Exception):
+        ip = request.remote_addr if request else 'unknown'
+        route = request.url_rule.rule if request.url_rule else 'unknown'
+        return CustomResponse.internal_error(f"An exception occurred: {str(e)}", {
+            "ip": ip,
+            "route": route
+        })
 
     with app.app_context():
-        db.create_all()
+        init_sqlite(app)
+
+        if app.config['DATABASE_AUTO_UPGRADE']:
+            upgrade_database()
+
+        if app.config['SEARCH_BACKEND'] == 'fts5':
+            search_fts.init_app(app)
 
     return app
 
@@ -59,38 +99,65 @@ def create_app():
 app = create_app()
 
 
-@app.errorhandler(Exception)
-def handle_exception(e: Exception):
-    ip = request.remote_addr if request else 'unknown'
-    route = request.url_rule.rule if request.url_rule else 'unknown'
-    return CustomResponse.internal_error(f"An exception occurred: {str(e)}", {
-        "ip": ip,
-        "route": route
-    })
+@app.cli.command('upgrade-database')
+def upgrade_database_command():
+    """Upgrade the database to the latest migration, stamping databases created before migrations."""
+    upgrade_database()
 
 
-def update_commodity_status():
-    with app.app_context():
-        for commodity in db.session.query(Commodity).all():
-            if datetime.now() > commodity.expireTime:
-                commodity.status = 'expired'
-                continue
+@app.cli.command('process-images')
+def process_images():
+    """Generate the missing variants of every stored image, so no image is served with its metadata."""
+    processed, skipped = prepare_stored_images()
+    click.echo(f"Processed {processed} images, skipped {skipped} that could not be processed, see the log")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Rebuild the commodity keyword search index from the commodity table."""
+    click.echo(f"Indexed {rebuild_index()} commodities")
+
+
+@app.cli.command('rebuild-reputation')
+def rebuild_reputation():
+    """Recompute the user reputation summary from the record table."""
+    mismatches = rebuild_reputations()
+    click.echo(f"Rebuilt user reputation, {len(mismatches)} users were out of sync")
+    for user_id in mismatches:
+        click.echo(f"  {user_id}")
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail when a query issued by the API endpoints scans a whole table."""
+    with tempfile.TemporaryDirectory() as directory:
+        scratch_app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{Path(directory) / 'query_plan.db'}",
+            'DATABASE_AUTO_UPGRADE': True,
+        })
+        full_scans = check_query_plans(scratch_app)
+        with scratch_app.app_context():
+            db.engine.dispose()
+
+    for label, statement, detail in full_scans:
+        click.echo(f"{label}: {detail}\n  {' '.join(statement.split())}")
+
+    if full_scans:
+        raise click.ClickException(f"{len(full_scans)} queries scan a whole table")
 
-            elif commodity.status == 'giving' and datetime.now() > commodity.giveExpireTime:
-                commodity.status = 'giveExpired'
-                continue
+    click.echo("No query scans a whole table")
 
-            if commodity.status == 'receiving' and datetime.now() > commodity.receiveExpireTime:
-                commodity.status = 'pending'
-                continue
 
-        db.session.commit()
+@app.cli.command('run-worker')
+def run_worker():
+    """Run the periodic jobs, start as many workers as needed, only the elected leader runs them."""
+    worker = JobWorker(app)
+    click.echo(f"Job worker {worker.owner} started")
+    worker.start()
 
 
 if __name__ == '__main__':
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(update_commodity_status, 'interval', seconds=1)
-    scheduler.start()
+    JobWorker(app, blocking=False).start()
 
     for folder_name in [Config.IMAGE_DIR]:
         Path(folder_name).mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,63 @@
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from models.commodity_model import Commodity
+
+STORAGE_GROUP_NUM = 50
+
+
+def make_commodities(size, seed=0):
+    """
+    Build detached commodities shaped like the rows a list endpoint loads, without a database.
+    """
+    generator = random.Random(seed)
+    now = datetime.now()
+    return [
+        Commodity(
+            id=index + 1,
+            giverId=f'giver{generator.randrange(1000)}',
+            receiverId=None,
+            storageGroupId=generator.randrange(STORAGE_GROUP_NUM) + 1,
+            name=f'commodity {index}',
+            description='a wooden chair in good condition, pick it up at the storage',
+            images=json.dumps([f'{index:064x}', f'{index + 1:064x}']),
+            status='giving',
+            category='furniture',
+            condition='used',
+            expireTime=now + timedelta(days=7),
+            giveExpireTime=now + timedelta(hours=3),
+            receiveExpireTime=None,
+            createdTime=now,
+            updatedTime=now,
+        )
+        for index in range(size)
+    ]
+
+
+def measure(function, repeat=5):
+    """
+    Measure a call of function.
+
+    :return: (best CPU seconds over repeat runs, peak traced allocation in bytes of one more run)
+    """
+    cpu = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.process_time()
+        function()
+        cpu = min(cpu, time.process_time() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def report(label, cpu, peak):
+    print(f'{label:<32} {cpu * 1000:10.1f} ms {peak / 2 ** 20:10.1f} MiB')
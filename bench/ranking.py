@@ -0,0 +1,72 @@
+"""
+CPU and allocations of ranking a location or keyword search, with pandas as before and with
+helpers.ranking as now.
+
+    python -m bench.ranking [--sizes 1000 10000 100000] [--limit 100]
+
+Both sides serialize with the current Commodity.to_dict, so only the ranking step differs. The pandas
+side is skipped when pandas is not installed.
+"""
+import argparse
+import json
+import math
+import random
+
+from bench.common import STORAGE_GROUP_NUM, make_commodities, measure, report
+from helpers.ranking import rank
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def rank_with_pandas(commodities, scores, distances, limit):
+    commodities_df = pd.DataFrame([commodity.to_dict() for commodity in commodities])
+    commodities_df['distance'] = commodities_df['storageGroupId'].map(distances)
+    commodities_df['importance'] = commodities_df['id'].map(scores).fillna(0)
+
+    commodities_df.sort_values(by=['importance', 'distance'], ascending=[False, True], inplace=True)
+    commodities_df.drop(columns=['importance', 'distance', 'giveExpireTime', 'receiveExpireTime'], inplace=True)
+    if limit is not None:
+        commodities_df = commodities_df.head(limit)
+
+    return json.loads(commodities_df.to_json(orient='records'))
+
+
+def rank_with_numpy(commodities, scores, distances, limit):
+    importance = [scores.get(commodity.id, 0.0) for commodity in commodities]
+    distance = [distances.get(commodity.storageGroupId, math.inf) for commodity in commodities]
+    commodities = [commodities[index] for index in rank(importance, distance, limit)]
+
+    data = [commodity.to_dict() for commodity in commodities]
+    for commodity in data:
+        del commodity['giveExpireTime'], commodity['receiveExpireTime']
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+
+    generator = random.Random(0)
+    distances = {group_id: generator.uniform(0, 10) for group_id in range(1, STORAGE_GROUP_NUM + 1)}
+
+    for size in arguments.sizes:
+        commodities = make_commodities(size)
+        # a keyword matches about half of the commodities
+        scores = {commodity.id: generator.uniform(0, 5) for commodity in commodities if generator.random() < 0.5}
+
+        print(f'{size} commodities, limit {arguments.limit}')
+        if pd is not None:
+            report('pandas', *measure(
+                lambda: rank_with_pandas(commodities, scores, distances, arguments.limit), arguments.repeat))
+        report('helpers.ranking', *measure(
+            lambda: rank_with_numpy(commodities, scores, distances, arguments.limit), arguments.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+CPU and allocations of serializing a page of commodities, with the reflective to_dict and the default
+JSON provider as before and with column_serializer and FastJSONProvider as now.
+
+    python -m bench.serialization [--size 10000]
+
+FastJSONProvider only differs from the default provider when orjson is installed.
+"""
+import argparse
+import json
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import app
+from bench.common import make_commodities, measure, report
+from models.commodity_model import Commodity
+
+
+def reflective_to_dict(commodity):
+    dict_representation = {c.name: getattr(commodity, c.name) for c in commodity.__table__.columns}
+    dict_representation['updatedTime'] = dict_representation['updatedTime'].isoformat()
+    dict_representation['createdTime'] = dict_representation['createdTime'].isoformat()
+    dict_representation['expireTime'] = dict_representation['expireTime'].isoformat()
+    dict_representation['images'] = json.loads(dict_representation['images'])
+    dict_representation['giveExpireSeconds'] = (
+            dict_representation['giveExpireTime'] - datetime.now()).total_seconds() \
+        if dict_representation['giveExpireTime'] else None
+    dict_representation['receiveExpireSeconds'] = (
+            dict_representation['receiveExpireTime'] - datetime.now()).total_seconds() \
+        if dict_representation['receiveExpireTime'] else None
+
+    return dict_representation
+
+
+def serialize(commodities, to_dict, provider):
+    data = [to_dict(commodity) for commodity in commodities]
+    return provider.response({'message': 'Commodities found', 'data': data}).get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+
+    commodities = make_commodities(arguments.size)
+    default_provider = DefaultJSONProvider(app)
+
+    print(f'{arguments.size} commodities')
+    with app.app_context():
+        report('to_dict before', *measure(
+            lambda: [reflective_to_dict(commodity) for commodity in commodities], arguments.repeat))
+        report('to_dict after', *measure(
+            lambda: [commodity.to_dict() for commodity in commodities], arguments.repeat))
+
+        data = [commodity.to_dict() for commodity in commodities]
+        report('encode before', *measure(lambda: default_provider.response(data).get_data(), arguments.repeat))
+        report('encode after', *measure(lambda: app.json.response(data).get_data(), arguments.repeat))
+
+        report('total before', *measure(
+            lambda: serialize(commodities, reflective_to_dict, default_provider), arguments.repeat))
+        report('total after', *measure(
+            lambda: serialize(commodities, Commodity.to_dict, app.json), arguments.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,73 @@
 import json
+import math
 from datetime import datetime, timedelta
-from helpers.custom_response import CustomResponse
+from helpers.custom_response import CustomResponse, wants_ndjson
 
 from models.commodity_model import Commodity, db
-from models.storage_model import StorageGroup, Storage
-
-import jieba
-import pandas as pd
-from flask import Blueprint, request
+from models.storage_model import StorageGroup
+from helpers.geo import nearby_storage_groups
+from helpers.commodity_search import index_commodity, search_commodities
+from helpers.ranking import rank
+from helpers.pagination import iterate, page_limit, paginate
+from helpers.storage_allocator import StorageGroupFull, allocate_storage
+from helpers.commodity_lifecycle import GIVE_WINDOW, INITIAL_STATUS, InvalidTransition, transition
+from helpers.response_cache import cached, invalidates
+from helpers.conditional import Validators, conditional
+
+from flask import Blueprint, current_app, request
+from sqlalchemy import case
 from sqlalchemy.orm import joinedload
 
 commodity_blueprint = Blueprint('commodity', __name__)
 
 
+def commodity_validators(commodity_id):
+    commodity = db.session.query(
+        Commodity.updatedTime, Commodity.effectiveStatus,
+        Commodity.expireTime, Commodity.giveExpireTime, Commodity.receiveExpireTime
+    ).filter(Commodity.id == commodity_id).first()
+    if not commodity:
+        return None
+
+    # the seconds left change with every request, the status also changes once a deadline passes
+    updated_time, status, *deadlines = commodity
+    passed = [deadline for deadline in deadlines if deadline and deadline <= datetime.now()]
+    return Validators((updated_time, status), weak=True, last_modified=max([updated_time, *passed]))
+
+
+def create_commodity(request_data):
+    """
+    Add a commodity in the giving status and claim a storage of its storage group for it, joining the
+    caller's transaction.
+
+    :raises StorageGroupFull: when the storage group has no free storage
+    """
+    now = datetime.now()
+    commodity = Commodity(
+        giverId=request_data['giverId'],
+        receiverId=None,
+        storageGroupId=request_data['storageGroupId'],
+        name=request_data['name'],
+        description=request_data['description'],
+
+        category=request_data['category'],
+        condition=request_data['condition'],
+        status=INITIAL_STATUS,
+        images=json.dumps(request_data['images']),
+
+        expireTime=now + timedelta(days=7),
+        giveExpireTime=now + GIVE_WINDOW,
+        receiveExpireTime=None
+    )
+    db.session.add(commodity)
+    db.session.flush()
+    allocate_storage(commodity.storageGroupId, commodity.id)
+    index_commodity(commodity)
+    return commodity
+
+
 @commodity_blueprint.route('/commodity', methods=['POST'])
+@invalidates('commodity', 'storage')
 def post_commodity():
     """
     Create a new commodity
@@ -35,6 +89,10 @@ def post_commodity():
         description: Bad request
         schema:
           id: BadRequest
+      409:
+        description: Storage group is full
+        schema:
+          id: Conflict
       500:
         description: Internal server error
         schema:
@@ -48,40 +106,99 @@ def post_commodity():
         if not storage_group:
             return CustomResponse.not_found(message='Storage group not found', data=None)
 
-        storage_group_dict = storage_group.to_dict()
-        if storage_group_dict['available'] <= 0:
-            return CustomResponse.bad_request(message='Storage group is full', data=None)
-
-        commodity = Commodity(
-            giverId=request_data['giverId'],
-            receiverId=None,
-            storageGroupId=request_data['storageGroupId'],
-            name=request_data['name'],
-            description=request_data['description'],
-
-            category=request_data['category'],
-            condition=request_data['condition'],
-            status="giving",
-            images=json.dumps(request_data['images']),
-
-            expireTime=datetime.now() + timedelta(days=7),
-            giveExpireTime=datetime.now() + timedelta(hours=3),
-            receiveExpireTime=None
-        )
-        db.session.add(commodity)
+        commodity = create_commodity(request_data)
         db.session.commit()
+    except StorageGroupFull:
+        db.session.rollback()
+        return CustomResponse.conflict(message='Storage group is full', data=None)
+    except Exception as e:
+        db.session.rollback()
+        return CustomResponse.bad_request(message=str(e), data=None)
+
+    return CustomResponse.created(message='Commodity created', data=commodity.to_dict())
+
+
+@commodity_blueprint.route('/commodities', methods=['POST'])
+@invalidates('commodity', 'storage')
+def post_commodities():
+    """
+    Create up to BULK_MAX_ITEMS commodities in one transaction, each claiming a storage of its storage group
+    ---
+    tags:
+      - commodity
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          id: CommodityBulkInput
+    responses:
+      201:
+        description: Every commodity created
+        schema:
+          id: CommodityBulk
+      207:
+        description: Some commodities could not be created, see the status of each item
+        schema:
+          id: CommodityBulk
+      400:
+        description: Bad request
+        schema:
+          id: BadRequest
+      500:
+        description: Internal server error
+        schema:
+          id: InternalError
+    """
+    request_data = request.get_json()
+    items = request_data.get('commodities') if isinstance(request_data, dict) else None
+
+    if not isinstance(items, list) or not items:
+        return CustomResponse.bad_request(message='commodities must be a non empty list', data=None)
+    if len(items) > current_app.config['BULK_MAX_ITEMS']:
+        return CustomResponse.bad_request(
+            message=f"At most {current_app.config['BULK_MAX_ITEMS']} commodities per request", data=None)
+
+    requested_ids = {item.get('storageGroupId') for item in items if isinstance(item, dict)}
+    storage_group_ids = {
+        id_ for id_, in db.session.query(StorageGroup.id).filter(
+            StorageGroup.id.in_([id_ for id_ in requested_ids if isinstance(id_, int)]))
+    }
+
+    # each item in its own savepoint, so a failed item is rolled back alone and the others commit together
+    results = []
+    for item in items:
+        if not isinstance(item, dict):
+            results.append({'status': 400, 'message': 'Invalid item', 'data': None})
+            continue
+        if item.get('storageGroupId') not in storage_group_ids:
+            results.append({'status': 404, 'message': 'Storage group not found', 'data': None})
+            continue
+
+        try:
+            with db.session.begin_nested():
+                commodity = create_commodity(item)
+            results.append({'status': 201, 'message': 'Commodity created', 'data': commodity.to_dict()})
+        except StorageGroupFull:
+            results.append({'status': 409, 'message': 'Storage group is full', 'data': None})
+        except Exception as e:
+            results.append({'status': 400, 'message': str(e), 'data': None})
 
-        empty_storage = [storage for storage in storage_group_dict['storages'] if not storage['commodityId']][0]
-        storage = db.session.query(Storage).get(empty_storage['id'])
-        storage.commodityId = commodity.id
+    try:
         db.session.commit()
     except Exception as e:
+        db.session.rollback()
         return CustomResponse.bad_request(message=str(e), data=None)
 
-    return CustomResponse.created(message='Commodity created', data=commodity.to_dict())
+    created = sum(result['status'] == 201 for result in results)
+    if created == len(results):
+        return CustomResponse.created(message='Commodities created', data=results)
+    return CustomResponse.multi_status(message=f'{created} of {len(results)} commodities created', data=results)
 
 
 @commodity_blueprint.route('/commodity/<commodity_id>', methods=['GET'])
+@conditional(commodity_validators)
+@cached('commodity', refresh=Commodity.refresh_time_fields)
 def get_commodity(commodity_id):
     """
     Get a commodity by id
@@ -98,6 +215,8 @@ def get_commodity(commodity_id):
         description: Commodity found
         schema:
           id: Commodity
+      304:
+        description: Not modified
       404:
         description: Commodity not found
         schema:
@@ -115,6 +234,7 @@ def get_commodity(commodity_id):
 
 
 @commodity_blueprint.route('/commodity/<commodity_id>', methods=['PATCH'])
+@invalidates('commodity', 'storage')
 def patch_commodity(commodity_id):
     """
     Update a commodity by id
@@ -136,6 +256,10 @@ def patch_commodity(commodity_id):
         description: Commodity updated
         schema:
           id: Commodity
+      409:
+        description: Status cannot change to the requested one
+        schema:
+          id: Conflict
       404:
         description: Commodity not found
         schema:
@@ -168,16 +292,19 @@ def patch_commodity(commodity_id):
     if 'images' in request_data:
         commodity.images = json.dumps(request_data['images'])
 
-    if 'status' in request_data:
-        commodity.status = request_data['status']
-        if commodity.status == "receiving":
-            commodity.receiveExpireTime = datetime.now() + timedelta(hours=3)
-        if commodity.status == "finished":
-            db.session.query(Storage).filter(Storage.commodityId == commodity.id).update({'commodityId': None})
-
     if 'receiverId' in request_data:
         commodity.receiverId = request_data['receiverId']
 
+    if 'name' in request_data or 'description' in request_data:
+        index_commodity(commodity)
+
+    if 'status' in request_data:
+        try:
+            transition(commodity, request_data['status'])
+        except InvalidTransition as e:
+            db.session.rollback()
+            return CustomResponse.conflict(message=str(e), data={'status': e.source})
+
     db.session.commit()
     return CustomResponse.no_content(message='Commodity updated', data=commodity.to_dict())
 
@@ -185,10 +312,13 @@ def patch_commodity(commodity_id):
 @commodity_blueprint.route('/commodity', methods=['GET'])
 def get_commodities():
     """
-    Get a commodities
+    Get a commodities, or stream them as NDJSON with Accept: application/x-ndjson
     ---
     tags:
       - commodity
+    produces:
+      - application/json
+      - application/x-ndjson
     parameters:
       - in: query
         name: longitude
@@ -199,6 +329,22 @@ def get_commodities():
       - in: query
         name: keyword
         type: string
+      - in: query
+        name: radius
+        type: float
+        description: search radius in kilometers around longitude/latitude, SEARCH_RADIUS_DEFAULT by default
+          and at most SEARCH_RADIUS_MAX
+      - in: query
+        name: limit
+        type: integer
+      - in: query
+        name: cursor
+        type: string
+        description: nextCursor of the previous page, ignored for keyword and location searches
+      - in: query
+        name: fields
+        type: string
+        description: comma separated fields to return
       - in: query
         name: storageGroupId
         type: string
@@ -228,7 +374,7 @@ def get_commodities():
     commodities = db.session.query(Commodity)
 
     if 'status' in request.args:
-        commodities = commodities.filter(Commodity.status == request.args['status'])
+        commodities = commodities.filter(Commodity.effective_status_is(request.args['status']))
 
     if 'giverId' in request.args:
         commodities = commodities.filter(Commodity.giverId == request.args['giverId'])
@@ -242,38 +388,65 @@ def get_commodities():
         if not storage_group:
             return CustomResponse.not_found(message='Storage group not found', data=None)
 
-        commodities = commodities.filter(Commodity.storageGroupId == request.args['storageGroupId']).all()
-        return CustomResponse.ok(message='Commodities found', data=[commodity.to_dict() for commodity in commodities])
+        commodities = commodities.filter(Commodity.storageGroupId == request.args['storageGroupId'])
 
-    if 'longitude' in request.args and 'latitude' in request.args and 'keyword' in request.args:
+    if 'longitude' in request.args and 'latitude' in request.args:
         longitude = float(request.args['longitude'])
         latitude = float(request.args['latitude'])
+        radius = min(
+            request.args.get('radius', current_app.config['SEARCH_RADIUS_DEFAULT'], type=float),
+            current_app.config['SEARCH_RADIUS_MAX']
+        )
 
-        commodities_df = pd.DataFrame([commodity.to_dict() for commodity in commodities])
-        if commodities_df.empty:
-            return CustomResponse.ok(message='Commodities found', data=[])
-
-        storage_group_df = pd.DataFrame([
-            storage_group.to_dict() for storage_group in db.session.query(StorageGroup)])[
-            ['id', 'longitude', 'latitude']]
-        storage_group_df.columns = ['storageGroupId', 'longitude', 'latitude']
+        distances = nearby_storage_groups(longitude, latitude, radius)
+        commodities = commodities.filter(Commodity.storageGroupId.in_(distances))
+    else:
+        distances = None
+
+    if 'keyword' not in request.args and distances is None:
+        if wants_ndjson():
+            return CustomResponse.stream(iterate(commodities, Commodity), Commodity.to_dict)
+
+        commodities, cursor = paginate(commodities, Commodity)
+        return CustomResponse.page(
+            message='Commodities found', data=[commodity.to_dict() for commodity in commodities], cursor=cursor)
+
+    limit = page_limit()
+
+    scores = {}
+    if 'keyword' in request.args:
+        # with a location the distance takes part in the ranking, every match is needed then
+        matches = search_commodities(
+            commodities, request.args['keyword'], limit if distances is None else None)
+        commodities = [commodity for commodity, _ in matches]
+        scores = {commodity.id: score for commodity, score in matches}
+    elif distances:
+        # without a keyword only the distance ranks, the nearest storage groups come first straight from SQL
+        nearest = case(
+            {storage_group_id: order for order, storage_group_id in enumerate(distances)},
+            value=Commodity.storageGroupId
+        )
+        commodities = commodities.order_by(nearest, Commodity.id).limit(limit).all()
+    else:
+        commodities = []
 
-        commodities_df = pd.merge(commodities_df, storage_group_df, on='storageGroupId')
+    if distances is not None:
+        importance = [scores.get(commodity.id, 0.0) for commodity in commodities]
+        distance = [distances.get(commodity.storageGroupId, math.inf) for commodity in commodities]
+        commodities = [commodities[index] for index in rank(importance, distance, limit)]
 
-        keyword_list = [
-            keyword.lower() for keyword in jieba.cut_for_search(request.args['keyword']) if keyword.strip()]
-        commodities_df['importance'] = (commodities_df['name'] + commodities_df['description']).apply(
-            lambda x: sum([word in x.lower() for word in keyword_list]))
+        data = [commodity.to_dict() for commodity in commodities]
+        for commodity in data:
+            del commodity['giveExpireTime'], commodity['receiveExpireTime']
 
-        commodities_df['longitude'] = (commodities_df['longitude'] - longitude) ** 2
-        commodities_df['latitude'] = (commodities_df['latitude'] - latitude) ** 2
-        commodities_df['distance'] = commodities_df['longitude'] + commodities_df['latitude']
+        if wants_ndjson():
+            return CustomResponse.stream(data)
 
-        commodities_df.sort_values(by=['importance', 'distance'], ascending=[False, True], inplace=True)
-        commodities_df.drop(
-            columns=['importance', 'distance', 'longitude', 'latitude', 'giveExpireTime', 'receiveExpireTime'],
-            inplace=True)
+        return CustomResponse.page(message='Commodities found', data=data, cursor=None)
 
-        return CustomResponse.ok(message='Commodities found', data=json.loads(commodities_df.to_json(orient='records')))
+    commodities = commodities[:limit]
+    if wants_ndjson():
+        return CustomResponse.stream(commodities, Commodity.to_dict)
 
-    return CustomResponse.ok(message='Commodities found', data=[commodity.to_dict() for commodity in commodities])
+    return CustomResponse.page(
+        message='Commodities found', data=[commodity.to_dict() for commodity in commodities], cursor=None)
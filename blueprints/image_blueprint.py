@@ -1,11 +1,14 @@
-import os
-from uuid import uuid4
 from pathlib import Path
 
-from config import Config
 from helpers.custom_response import CustomResponse
+from helpers.image_pipeline import VARIANTS, InvalidImage, best_variant
+from helpers.image_store import (
+    forget_image, locate_image, prepare_image, publish_image, receive_uploads, release_image, send_image,
+    store_image
+)
 from models.image_model import Image, db
-from flask import Blueprint, request, send_file, current_app
+from flask import Blueprint, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge
 
 image_blueprint = Blueprint('image', __name__)
 
@@ -22,19 +25,60 @@ def get_image(image_id):
         name: id_
         required: true
         type: integer
+      - in: query
+        name: size
+        type: string
+        enum: [thumb, medium, full]
+        default: full
+        description: served as WebP when accepted, JPEG otherwise, the full variant until this one is ready
+    responses:
+      200:
+        description: The image, cacheable for good once its variants are ready
+      206:
+        description: The requested range of the image
+      304:
+        description: The image has not changed
+      404:
+        description: Image not found
+        schema:
+          id: NotFound
+      415:
+        description: The stored file is not an image that can be served, like uploads from before they were checked
+        schema:
+          id: BadRequest
     """
-    image = Image.query.get(image_id)
+    size = request.args.get('size', 'full')
+    if size not in VARIANTS:
+        return CustomResponse.bad_request(f'size must be one of {", ".join(VARIANTS)}', {})
 
-    if image is None:
+    filepath = locate_image(image_id)
+
+    if filepath is None:
         return CustomResponse.not_found('image not found', {})
 
-    return send_file(image.filepath)
+    path, mimetype, exact = best_variant(filepath, size, request.accept_mimetypes)
+    if path is None:
+        if not Path(filepath).exists():
+            # deleted through another worker since it was looked up
+            forget_image(image_id)
+            return CustomResponse.not_found('image not found', {})
+
+        # stored before variants existed, or its processing was lost, the original keeps its metadata
+        try:
+            prepare_image(filepath)
+        except InvalidImage as e:
+            return CustomResponse.unsupported_media_type(f'image {image_id} cannot be served: {e}', {})
+        path, mimetype, exact = best_variant(filepath, size, request.accept_mimetypes)
+
+    response = send_image(path, mimetype, immutable=exact)
+    response.vary.add('Accept')
+    return response
 
 
 @image_blueprint.route('', methods=['POST'])
 def post_image():
     """
-    Post image
+    Post image, an image already uploaded with the same content is shared and gets one more reference
     ---
     tags:
       - image
@@ -48,25 +92,118 @@ def post_image():
         description: Image uploaded
         schema:
           id: Image
+      413:
+        description: Image larger than IMAGE_MAX_BYTES
+        schema:
+          id: BadRequest
+      415:
+        description: Not an image of a supported format
+        schema:
+          id: BadRequest
       500:
         description: Internal server error
         schema:
           id: InternalError
     """
-    image = request.files['image']
-    file_name = image.filename
+    try:
+        uploads = receive_uploads('image')
+    except RequestEntityTooLarge as e:
+        return CustomResponse.payload_too_large(e.description, {})
+
+    if not uploads:
+        return CustomResponse.bad_request('image is required', {})
 
-    new_file_name = f"{uuid4()}.{file_name.split('.')[-1]}"
-    new_file_path = Path(Config.IMAGE_DIR) / Path(new_file_name)
-    image.save(new_file_path)
+    file_name, upload = uploads[0]
+    for _, extra in uploads[1:]:
+        extra.discard()
+
+    try:
+        image = store_image(file_name, upload)
+    except InvalidImage as e:
+        return CustomResponse.unsupported_media_type(str(e), {})
 
-    image = Image(filename=file_name, filepath=str(new_file_path))
-    db.session.add(image)
     db.session.commit()
+    publish_image(image, upload)
 
     return CustomResponse.created('post image success', image.to_dict())
 
 
+@image_blueprint.route('batch', methods=['POST'])
+def post_images():
+    """
+    Post up to BULK_MAX_ITEMS images in one request, with one result per file in the order they were sent
+    ---
+    tags:
+      - image
+    consumes:
+      - multipart/form-data
+    parameters:
+      - in: formData
+        name: images
+        type: array
+        items:
+          type: file
+        collectionFormat: multi
+        required: true
+    responses:
+      201:
+        description: Every image uploaded
+        schema:
+          id: ImageBulk
+      207:
+        description: Some files are not images of a supported format, see the status of each item
+        schema:
+          id: ImageBulk
+      400:
+        description: Bad request
+        schema:
+          id: BadRequest
+      413:
+        description: One of the images is larger than IMAGE_MAX_BYTES, nothing was uploaded
+        schema:
+          id: BadRequest
+      500:
+        description: Internal server error
+        schema:
+          id: InternalError
+    """
+    try:
+        uploads = receive_uploads('images')
+    except RequestEntityTooLarge as e:
+        return CustomResponse.payload_too_large(e.description, {})
+
+    if not uploads:
+        return CustomResponse.bad_request('images is required', {})
+    if len(uploads) > current_app.config['BULK_MAX_ITEMS']:
+        for _, upload in uploads:
+            upload.discard()
+        return CustomResponse.bad_request(f"At most {current_app.config['BULK_MAX_ITEMS']} images per request", {})
+
+    results, stored = [], {}
+    for file_name, upload in uploads:
+        try:
+            image = store_image(file_name, upload)
+        except InvalidImage as e:
+            results.append({'status': 415, 'message': str(e), 'data': None})
+            continue
+
+        # the same content twice in one batch is stored once, with one reference per copy
+        if image.id in stored:
+            upload.discard()
+        else:
+            stored[image.id] = (image, upload)
+        results.append({'status': 201, 'message': 'post image success', 'data': image.to_dict()})
+
+    db.session.commit()
+    for image, upload in stored.values():
+        publish_image(image, upload)
+
+    created = sum(result['status'] == 201 for result in results)
+    if created == len(results):
+        return CustomResponse.created('post images success', results)
+    return CustomResponse.multi_status(f'{created} of {len(results)} images uploaded', results)
+
+
 @image_blueprint.route('<image_id>', methods=['DELETE'])
 def delete_image(image_id):
     """
@@ -85,8 +222,7 @@ def delete_image(image_id):
     if attachment is None:
         return CustomResponse.not_found('image not found', '')
 
-    os.remove(attachment.filepath)
-    db.session.delete(attachment)
-    db.session.commit()
+    attachment_data = attachment.to_dict()
+    release_image(attachment)
 
-    return CustomResponse.no_content('delete image success', attachment.to_dict())
+    return CustomResponse.no_content('delete image success', attachment_data)
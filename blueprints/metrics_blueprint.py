@@ -0,0 +1,47 @@
+from helpers.custom_response import CustomResponse
+from helpers.jobs import job_metrics
+
+from flask import Blueprint, current_app
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+
+@metrics_blueprint.route('/cache', methods=['GET'])
+def get_cache_metrics():
+    """
+    Get the response cache hits and misses of every cached route
+    ---
+    tags:
+      - metrics
+    responses:
+      200:
+        description: Cache metrics found
+        schema:
+          id: CacheMetrics
+      500:
+        description: Internal server error
+        schema:
+          id: InternalError
+    """
+    cache = current_app.extensions['response_cache']
+    return CustomResponse.ok(message='Cache metrics found', data=cache.metrics())
+
+
+@metrics_blueprint.route('/jobs', methods=['GET'])
+def get_job_metrics():
+    """
+    Get the run counts and durations of every periodic job
+    ---
+    tags:
+      - metrics
+    responses:
+      200:
+        description: Job metrics found
+        schema:
+          id: JobMetrics
+      500:
+        description: Internal server error
+        schema:
+          id: InternalError
+    """
+    return CustomResponse.ok(message='Job metrics found', data=job_metrics())
@@ -1,14 +1,26 @@
-from helpers.custom_response import CustomResponse
+from helpers.custom_response import CustomResponse, wants_ndjson
 
-from models.record_model import Record, db
+from models.record_model import Record, UserReputation, db
+from helpers.reputation import add_record, get_reputations
+from helpers.pagination import iterate, paginate
+from helpers.response_cache import cached, invalidates
+from helpers.conditional import Validators, conditional, fingerprint, table_version
 from flask import Blueprint, request
 
-import pandas as pd
-
 record_blueprint = Blueprint('record', __name__)
 
 
+def record_validators(user_id):
+    updated_time, count = fingerprint(UserReputation.version(UserReputation.userId == user_id))
+    return Validators((updated_time, count), last_modified=updated_time)
+
+
+def records_validators():
+    return Validators(fingerprint(table_version(Record)))
+
+
 @record_blueprint.route('/record', methods=['POST'])
+@invalidates('record')
 def post_record():
     """
     Create a new record
@@ -45,35 +57,59 @@ def post_record():
         reason=request_data['reason']
     )
     db.session.add(record)
+    add_record(record)
     db.session.commit()
 
     record = record.to_dict()
     return CustomResponse.created(message='Record created', data=record)
 
 
-@record_blueprint.route('/record', methods=['POST'])
+@record_blueprint.route('/record', methods=['GET'])
+@conditional(records_validators)
 def get_records():
     """
-    Get all records
+    Get all records, or stream all of them as NDJSON with Accept: application/x-ndjson
     ---
     tags:
       - record
+    produces:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - in: query
+        name: limit
+        type: integer
+      - in: query
+        name: cursor
+        type: string
+        description: nextCursor of the previous page
+      - in: query
+        name: fields
+        type: string
+        description: comma separated fields to return
     responses:
       200:
         description: Records found
         schema:
           id: RecordQuery
+      304:
+        description: Not modified
       500:
         description: Internal server error
         schema:
           id: InternalError
     """
-    records = Record.query.all()
+    if wants_ndjson():
+        return CustomResponse.stream(iterate(db.session.query(Record), Record), Record.to_dict)
+
+    records, cursor = paginate(db.session.query(Record), Record)
     records = [record.to_dict() for record in records]
-    return CustomResponse.ok(message='Records found', data=records)
+    return CustomResponse.page(message='Records found', data=records, cursor=cursor)
 
 
 @record_blueprint.route('/record/<user_id>', methods=['GET'])
+@conditional(record_validators)
+@cached('record')
 def get_record(user_id):
     """
     Get a record by user id
@@ -89,6 +125,8 @@ def get_record(user_id):
         description: Record found
         schema:
           id: UserRecord
+      304:
+        description: Not modified
       404:
         description: Record not found
         schema:
@@ -98,24 +136,44 @@ def get_record(user_id):
         schema:
           id: InternalError
     """
-    records = db.session.query(Record).filter(Record.userId == user_id).all()
-    if not records:
-        return CustomResponse.ok(message='Record not found', data={
-        'recordNum': 0,
-        'meanReward': 5,
-        'reportNum': 0,
-        'evaluation': 'good'
-    })
-
-    record_df = pd.DataFrame([record.to_dict() for record in records])
-    recordNum = len(record_df)
-    meanReward = float(record_df['reward'].mean())
-    reportNum = int((record_df['reason'] == 'report').sum())
-    evaluation = 'good' if reportNum < recordNum * 0.1 else 'bad'
-
-    return CustomResponse.ok(message='Record found', data={
-        'recordNum': recordNum,
-        'meanReward': meanReward,
-        'reportNum': reportNum,
-        'evaluation': evaluation
-    })
\ No newline at end of file
+    user_reputation = get_reputations([user_id])[user_id]
+    if not user_reputation['recordNum']:
+        return CustomResponse.ok(message='Record not found', data=user_reputation)
+
+    return CustomResponse.ok(message='Record found', data=user_reputation)
+
+
+@record_blueprint.route('/reputation', methods=['GET'])
+def get_reputation_batch():
+    """
+    Get the reputation of many users at once
+    ---
+    tags:
+      - record
+    parameters:
+      - in: query
+        name: userId
+        type: array
+        items:
+          type: string
+        collectionFormat: multi
+        required: true
+    responses:
+      200:
+        description: Reputations found
+        schema:
+          id: UserRecordBatch
+      400:
+        description: Bad request
+        schema:
+          id: BadRequest
+      500:
+        description: Internal server error
+        schema:
+          id: InternalError
+    """
+    user_ids = request.args.getlist('userId')
+    if not user_ids:
+        return CustomResponse.bad_request(message='userId is required', data=None)
+
+    return CustomResponse.ok(message='Reputations found', data=get_reputations(user_ids))
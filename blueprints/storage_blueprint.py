@@ -1,13 +1,46 @@
 from datetime import datetime
 from helpers.custom_response import CustomResponse
 
+from helpers.pagination import paginate
+from helpers.response_cache import cached, invalidates
+from helpers.conditional import Validators, conditional, fingerprint, table_version
 from models.storage_model import StorageGroup, Storage, db
 from flask import Blueprint, request
+from sqlalchemy.orm import selectinload
 
 storage_blueprint = Blueprint('storage', __name__)
 
 
+def storage_group_validators(storage_group_id):
+    version = fingerprint(
+        StorageGroup.version(StorageGroup.id == storage_group_id),
+        Storage.version(Storage.storageGroupId == storage_group_id)
+    )
+    if not version[1]:
+        return None
+
+    # no Last-Modified, deleting or moving a storage changes the storage group without moving any updatedTime
+    return Validators(version)
+
+
+def storage_groups_validators():
+    return Validators(fingerprint(table_version(StorageGroup), table_version(Storage)))
+
+
+def storage_validators(storage_id):
+    updated_time, count = fingerprint(Storage.version(Storage.id == storage_id))
+    if not count:
+        return None
+
+    return Validators((updated_time,), last_modified=updated_time)
+
+
+def storages_validators():
+    return Validators(fingerprint(table_version(Storage)))
+
+
 @storage_blueprint.route('/storage_group', methods=['POST'])
+@invalidates('storage')
 def post_storage_group():
     """
     Create a new storage group
@@ -49,6 +82,7 @@ def post_storage_group():
 
 
 @storage_blueprint.route('/storage_group/<storage_group_id>', methods=['PATCH'])
+@invalidates('storage')
 def patch_storage_group(storage_group_id):
     """
     Patch a storage group
@@ -100,6 +134,8 @@ def patch_storage_group(storage_group_id):
 
 
 @storage_blueprint.route('/storage_group/<storage_group_id>', methods=['GET'])
+@conditional(storage_group_validators)
+@cached('storage')
 def get_storage_group(storage_group_id):
     """
     Get a storage group
@@ -116,6 +152,8 @@ def get_storage_group(storage_group_id):
         description: Storage group found
         schema:
           id: StorageGroup
+      304:
+        description: Not modified
       404:
         description: Not found
         schema:
@@ -134,28 +172,58 @@ def get_storage_group(storage_group_id):
 
 
 @storage_blueprint.route('/storage_group', methods=['GET'])
+@conditional(storage_groups_validators)
+@cached('storage')
 def get_storage_groups():
     """
     Get all storage groups
     ---
     tags:
       - storage
+    parameters:
+      - in: query
+        name: embed
+        type: string
+        enum: [storages]
+        description: also return the storages of every storage group
+      - in: query
+        name: limit
+        type: integer
+      - in: query
+        name: cursor
+        type: string
+        description: nextCursor of the previous page
+      - in: query
+        name: fields
+        type: string
+        description: comma separated fields to return
     responses:
       200:
         description: Storage groups found
         schema:
-          id: StorageGroup
+          id: StorageGroupQuery
+      304:
+        description: Not modified
       500:
         description: Internal server error
         schema:
           id: InternalError
     """
-    storage_groups = db.session.query(StorageGroup).all()
-    data = [storage_group.to_dict() for storage_group in storage_groups]
-    return CustomResponse.ok(message='Storage groups found', data=data)
+    storage_groups = db.session.query(StorageGroup)
+
+    if request.args.get('embed') == 'storages':
+        storage_groups, cursor = paginate(storage_groups.options(selectinload(StorageGroup.storages)), StorageGroup)
+        data = [storage_group.to_dict() for storage_group in storage_groups]
+        return CustomResponse.page(message='Storage groups found', data=data, cursor=cursor)
+
+    storage_groups, cursor = paginate(storage_groups, StorageGroup)
+    availability = StorageGroup.availability([storage_group.id for storage_group in storage_groups])
+    data = [storage_group.to_dict(with_storages=False, availability=availability) for storage_group in storage_groups]
+    return CustomResponse.page(message='Storage groups found', data=data, cursor=cursor)
 
 
 @storage_blueprint.route('/storage_group/<storage_group_id>', methods=['DELETE'])
+@invalidates('storage')
 def delete_storage_group(storage_group_id):
     """
     Delete a storage group
@@ -191,6 +259,7 @@ def delete_storage_group(storage_group_id):
 
 
 @storage_blueprint.route('/storage', methods=['POST'])
+@invalidates('storage')
 def post_storage():
     """
     Create a new storage
@@ -230,6 +299,7 @@ def post_storage():
 
 
 @storage_blueprint.route('/storage/<storage_id>', methods=['PATCH'])
+@invalidates('storage')
 def patch_storage(storage_id):
     """
     Patch a storage
@@ -279,6 +349,7 @@ def patch_storage(storage_id):
 
 
 @storage_blueprint.route('/storage/<storage_id>', methods=['GET'])
+@conditional(storage_validators)
 def get_storage(storage_id):
     """
     Get a storage
@@ -295,6 +366,8 @@ def get_storage(storage_id):
         description: Storage found
         schema:
           id: Storage
+      304:
+        description: Not modified
       404:
         description: Not found
         schema:
@@ -312,6 +385,7 @@ def get_storage(storage_id):
 
 
 @storage_blueprint.route('/storage', methods=['GET'])
+@conditional(storages_validators)
 def get_storages():
     """
     Get all storages
@@ -322,11 +396,24 @@ def get_storages():
       - in: query
         name: storageGroupId
         type: integer
+      - in: query
+        name: limit
+        type: integer
+      - in: query
+        name: cursor
+        type: string
+        description: nextCursor of the previous page
+      - in: query
+        name: fields
+        type: string
+        description: comma separated fields to return
     responses:
       200:
         description: Storages found
         schema:
-          id: Storage
+          id: StorageQuery
+      304:
+        description: Not modified
       500:
         description: Internal server error
         schema:
@@ -337,11 +424,13 @@ def get_storages():
     if 'storageGroupId' in request.args:
         storages = storages.filter(Storage.storageGroupId == request.args['storageGroupId'])
 
-    data = [storage.to_dict() for storage in storages.all()]
-    return CustomResponse.ok(message='Storages found', data=data)
+    storages, cursor = paginate(storages, Storage)
+    data = [storage.to_dict() for storage in storages]
+    return CustomResponse.page(message='Storages found', data=data, cursor=cursor)
 
 
 @storage_blueprint.route('/storage/<storage_id>', methods=['DELETE'])
+@invalidates('storage')
 def delete_storage(storage_id):
     """
     Delete a storage
@@ -1,5 +1,67 @@
+import os
+
+from sqlalchemy.engine import make_url
+
+
+def database_uri():
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+    # SQLAlchemy only knows the postgresql:// scheme, most hosting providers hand out postgres://
+    if uri.startswith('postgres://'):
+        uri = uri.replace('postgres://', 'postgresql://', 1)
+    return uri
+
+
+def engine_options(uri):
+    options = {
+        'pool_pre_ping': os.environ.get('DATABASE_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE', 1800)),
+    }
+    url = make_url(uri)
+    # an in-memory SQLite database lives in the single connection of a StaticPool, which takes no pool size
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options['pool_size'] = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+    options['max_overflow'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+    return options
+
+
 class Config:
     PORT = 5000
     HOST = '0.0.0.0'
     IMAGE_DIR = 'statics/images'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///database.db'
\ No newline at end of file
+    IMAGE_WORKERS = 2
+    IMAGE_MAX_PIXELS = 40_000_000
+    IMAGE_MAX_BYTES = 16 * 1024 * 1024
+    IMAGE_MAX_AGE = 365 * 24 * 3600
+    IMAGE_LOOKUP_SIZE = 8192
+    IMAGE_LOOKUP_TTL = 300
+    # x-accel (nginx) or x-sendfile (apache, lighttpd) to have the fronting server send the image bytes,
+    # nginx maps IMAGE_ACCEL_PREFIX to IMAGE_DIR in an internal location
+    IMAGE_SENDFILE = os.environ.get('IMAGE_SENDFILE')
+    IMAGE_ACCEL_PREFIX = '/protected-images/'
+    USE_X_SENDFILE = IMAGE_SENDFILE == 'x-sendfile'
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024
+    SQLALCHEMY_DATABASE_URI = database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # upgrading on every import races when several processes start together, deployments run
+    # flask upgrade-database once before starting them instead
+    DATABASE_AUTO_UPGRADE = os.environ.get('DATABASE_AUTO_UPGRADE', 'false').lower() == 'true'
+    SQLITE_SERIALIZE_WRITES = True
+    COMMODITY_EXPIRY_INTERVAL = 60
+    JOB_LEASE_SECONDS = 30
+    JOB_JITTER = 5
+    SEARCH_BACKEND = 'index'
+    JIEBA_CACHE_DIR = None
+    TOKENIZER_CACHE_SIZE = 4096
+    TOKENIZER_POOL_SIZE = 4
+    SEARCH_RADIUS_DEFAULT = 10.0
+    SEARCH_RADIUS_MAX = 50.0
+    PAGE_LIMIT_DEFAULT = 100
+    PAGE_LIMIT_MAX = 1000
+    STREAM_BATCH_SIZE = 1000
+    BULK_MAX_ITEMS = 100
+    RESPONSE_CACHE_TTL = 30
+    RESPONSE_CACHE_SIZE = 1024
+    # redis:// URL shared by every worker (needs the redis package), memory:// for an in-process fake that
+    # only suits a single process, the response cache is off when unset
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')
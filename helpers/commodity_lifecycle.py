@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+from blinker import Namespace
+from sqlalchemy.orm.attributes import set_committed_value
+
+from helpers.response_cache import invalidate_on_commit
+from models.commodity_model import EXPIRY_RULES, Commodity, db
+from models.storage_model import Storage
+
+INITIAL_STATUS = 'giving'
+GIVE_WINDOW = timedelta(hours=3)
+RECEIVE_WINDOW = timedelta(hours=3)
+
+# status: the statuses a commodity can move to from it, the deadline driven ones of EXPIRY_RULES included
+TRANSITIONS = {
+    'giving': {'receiving', 'giveExpired', 'expired'},
+    'receiving': {'giving', 'finished', 'pending', 'expired'},
+    'pending': {'giving', 'receiving', 'finished', 'expired'},
+    'giveExpired': {'giving', 'finished', 'expired'},
+    'finished': {'expired'},
+    'expired': set(),
+}
+
+signals = Namespace()
+
+# sent with the target status as sender and commodity_ids, source as keyword arguments, from within the
+# transaction that made the transition so the writes of receivers commit or roll back together with it
+commodity_transitioned = signals.signal('commodity-transitioned')
+
+
+class InvalidTransition(Exception):
+    def __init__(self, source, target):
+        super().__init__(f"Commodity cannot go from {source} to {target}")
+        self.source = source
+        self.target = target
+
+
+def transition(commodity, target, now=None):
+    """
+    Move a commodity from its effective status to target, as one UPDATE conditional on that status.
+
+    Joins the caller's transaction, commit it to apply the transition.
+
+    :raise InvalidTransition: target is not reachable from the status of the commodity, or another request
+        changed the status in between
+    """
+    now = now or datetime.now()
+    source = commodity.effectiveStatus
+    if source == target:
+        return
+
+    if target not in TRANSITIONS.get(source, ()):
+        raise InvalidTransition(source, target)
+
+    # a commodity given again or received gets a full window, the old deadline would resolve it straight
+    # back to giveExpired or pending
+    values = {'status': target, 'updatedTime': now}
+    if target == 'giving':
+        values['giveExpireTime'] = now + GIVE_WINDOW
+    if target == 'receiving':
+        values['receiveExpireTime'] = now + RECEIVE_WINDOW
+
+    updated = db.session.query(Commodity).filter(
+        Commodity.id == commodity.id, Commodity.effective_status_is(source)
+    ).update(values, synchronize_session=False)
+    if not updated:
+        raise InvalidTransition(db.session.query(Commodity.effectiveStatus).filter(
+            Commodity.id == commodity.id).scalar(), target)
+
+    for key, value in values.items():
+        set_committed_value(commodity, key, value)
+
+    commodity_transitioned.send(target, commodity_ids=[commodity.id], source=source)
+
+
+def expire_commodities(now=None):
+    """
+    Persist the effective status of every commodity whose deadline has passed.
+
+    Reads resolve the status through Commodity.effectiveStatus, so this is only a compaction pass
+    keeping the stored column close to it. Each (rule, stored status) pair is a single set-based UPDATE
+    whose predicate is served by one of the (status, deadline) indexes, so rows that are not due are
+    never read.
+
+    :return: the number of rows moved to each status
+    """
+    now = now or datetime.now()
+    returning = db.session.get_bind().dialect.update_returning
+
+    transitioned = {}
+    for statuses, deadline, target in EXPIRY_RULES:
+        transitioned[target] = 0
+        for source in statuses:
+            condition = (Commodity.status == source) & (getattr(Commodity, deadline) < now)
+            if returning:
+                commodity_ids = db.session.execute(db.update(Commodity).where(condition).values(
+                    status=target, updatedTime=now).returning(Commodity.id)).scalars().all()
+            else:
+                commodity_ids = [id_ for id_, in db.session.query(Commodity.id).filter(condition)]
+                db.session.query(Commodity).filter(Commodity.id.in_(commodity_ids)).update(
+                    {'status': target, 'updatedTime': now}, synchronize_session=False)
+
+            if commodity_ids:
+                transitioned[target] += len(commodity_ids)
+                commodity_transitioned.send(target, commodity_ids=commodity_ids, source=source)
+
+    db.session.commit()
+    return transitioned
+
+
+@commodity_transitioned.connect_via('finished')
+def release_storages(target, commodity_ids, **kwargs):
+    db.session.query(Storage).filter(Storage.commodityId.in_(commodity_ids)).update(
+        {'commodityId': None, 'updatedTime': datetime.now()}, synchronize_session=False)
+
+
+@commodity_transitioned.connect
+def invalidate_responses(target, commodity_ids, **kwargs):
+    invalidate_on_commit('commodity', 'storage')
@@ -0,0 +1,20 @@
+from flask import current_app
+
+from helpers import search_fts, search_index
+
+
+def index_commodity(commodity):
+    if current_app.config['SEARCH_BACKEND'] == 'index':
+        search_index.index_commodity(commodity)
+
+
+def search_commodities(commodities, keyword, limit=None):
+    """
+    Restrict the commodities query to the ones matching the keyword, with the configured SEARCH_BACKEND.
+
+    :return: list of (commodity, score), best first, at most limit of them
+    """
+    if current_app.config['SEARCH_BACKEND'] == 'fts5':
+        return search_fts.search(commodities, keyword, limit)
+
+    return search_index.search(commodities, keyword, limit)
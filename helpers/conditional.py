@@ -0,0 +1,98 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import g, make_response, request
+from sqlalchemy import func
+
+from helpers.counters import counter_value, deletion_counter
+from helpers.custom_response import wants_ndjson
+from models.database import db
+
+
+class Validators:
+    """
+    What a conditional GET is compared against.
+
+    :param parts: values the response body is a function of, hashed into the ETag together with the URL
+    :param weak: whether equal parts only mean an equivalent body, not a byte for byte identical one
+    :param last_modified: naive local time the resource last changed, None when deletions or the clock can
+        change the body without moving it
+    """
+    def __init__(self, parts, weak=False, last_modified=None):
+        self.etag = hashlib.sha1(repr((request.full_path, wants_ndjson(), *parts)).encode()).hexdigest()
+        self.weak = weak
+        self.last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0) \
+            if last_modified else None
+
+    def not_modified(self):
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+
+        if request.if_modified_since and self.last_modified:
+            return self.last_modified <= request.if_modified_since
+
+        return False
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=self.weak)
+        response.vary.add('Accept')
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        return response
+
+
+def table_version(model):
+    """
+    Select the latest updatedTime of a whole table and the number of rows ever deleted from it, which
+    together change whenever one of its rows is inserted, updated or deleted.
+
+    Both are read through an index, the updatedTime one and the unique name of the deletion counter, where
+    counting the rows like SchemaMixin.version would read the whole table on every poll.
+    """
+    return db.select(
+        db.select(func.max(model.updatedTime)).scalar_subquery(),
+        counter_value(deletion_counter(model))
+    )
+
+
+def fingerprint(*statements):
+    """
+    Run several version selects of SchemaMixin.version or table_version as a single query.
+    """
+    columns = [
+        statement.with_only_columns(column).scalar_subquery()
+        for statement in statements for column in statement.selected_columns
+    ]
+    return tuple(db.session.execute(db.select(*columns)).one())
+
+
+def conditional(validators):
+    """
+    Answer a GET with 304 Not Modified when the client already has the current representation.
+
+    validators is called with the view arguments before the view, and returns Validators or None when the
+    resource does not exist. A matching If-None-Match, or If-Modified-Since when no ETag was sent, returns
+    before the view has loaded or serialized anything. The ETag is left in g.etag for the response cache to
+    key its entries with, so a body cached before the last change is never served under the new ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            current = validators(*args, **kwargs)
+            if current is None:
+                return view(*args, **kwargs)
+
+            if current.not_modified():
+                return current.apply(make_response('', 304))
+
+            g.etag = current.etag
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                current.apply(response)
+            return response
+
+        return wrapper
+
+    return decorator
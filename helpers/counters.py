@@ -0,0 +1,68 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from models.counter_model import StatCounter, db
+from models.database import UPSERT_DIALECTS
+
+
+def deletion_counter(model):
+    return f'{model.__tablename__}.deleteNum'
+
+
+def add_to_counters(increments, session=None):
+    """
+    Add each increment to the counter of its name, creating the counters that do not exist yet.
+
+    The changes join the transaction of session, commit it together with what is being counted. Counters
+    are written in name order, so transactions adding to the same counters never deadlock.
+    """
+    session = session or db.session
+    increments = {name: increment for name, increment in sorted(increments.items()) if increment}
+    if not increments:
+        return
+
+    now = datetime.now()
+    dialect = session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        for name, increment in increments.items():
+            updated = session.execute(db.update(StatCounter).where(StatCounter.name == name).values(
+                value=StatCounter.value + increment, updatedTime=now)).rowcount
+            if not updated:
+                session.execute(db.insert(StatCounter).values(
+                    name=name, value=increment, createdTime=now, updatedTime=now))
+        return
+
+    statement = UPSERT_DIALECTS[dialect](StatCounter).values([
+        {'name': name, 'value': increment, 'createdTime': now, 'updatedTime': now}
+        for name, increment in increments.items()
+    ])
+    statement = statement.on_conflict_do_update(index_elements=['name'], set_={
+        'value': StatCounter.value + statement.excluded.value, 'updatedTime': now})
+    session.execute(statement)
+
+
+def counter_value(name):
+    """
+    Select the value of a counter, 0 before anything was added to it, by its unique name.
+    """
+    return func.coalesce(db.select(StatCounter.value).where(StatCounter.name == name).scalar_subquery(), 0)
+
+
+def read_counters(*names):
+    values = dict(db.session.query(StatCounter.name, StatCounter.value).filter(StatCounter.name.in_(names)))
+    return [values.get(name, 0) for name in names]
+
+
+def count_deletions(session, flush_context):
+    # rows removed by bulk query deletes are not counted, tables fingerprinted with
+    # helpers.conditional.table_version are only deleted from through the session
+    deletions = Counter(deletion_counter(type(instance)) for instance in session.deleted)
+    add_to_counters(deletions, session)
+
+
+def init_app(app):
+    if not event.contains(Session, 'after_flush', count_deletions):
+        event.listen(Session, 'after_flush', count_deletions)
@@ -1,4 +1,61 @@
-from flask import jsonify
+from flask import Response, current_app, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson when it is installed, and like the default provider otherwise.
+
+    The output keeps the conventions of the default provider: sorted keys, datetimes as HTTP dates and
+    indentation in debug mode. Non ASCII characters are written as UTF-8 instead of escape sequences.
+    """
+    def option(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+
+        return orjson.dumps(obj, default=self.default, option=self.option()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self.option(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+NDJSON = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """
+    Whether the client asked for newline delimited JSON over a single JSON document.
+    """
+    return request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+
+def requested_fields():
+    return request.args['fields'].split(',') if request.args.get('fields') else None
 
 
 class CustomResponse:
@@ -6,10 +63,43 @@ class CustomResponse:
     def ok(message, data):
         return jsonify({'message': message, 'data': data}), 200
 
+    @staticmethod
+    def page(message, data, cursor):
+        """
+        A page of a list endpoint, keeping only the comma separated fields query argument when given.
+        """
+        fields = requested_fields()
+        if fields:
+            data = [{field: item[field] for field in fields if field in item} for item in data]
+
+        return jsonify({'message': message, 'data': data, 'nextCursor': cursor}), 200
+
+    @staticmethod
+    def stream(items, serialize=None):
+        """
+        Newline delimited JSON with one item per line, each item serialized and written out as items is
+        iterated, so memory does not grow with the number of items. Keeps only the fields query argument
+        when given.
+        """
+        fields = requested_fields()
+
+        def generate():
+            for item in items:
+                data = serialize(item) if serialize else item
+                if fields:
+                    data = {field: data[field] for field in fields if field in data}
+                yield current_app.json.dumps(data) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype=NDJSON), 200
+
     @staticmethod
     def created(message, data):
         return jsonify({'message': message, 'data': data}), 201
 
+    @staticmethod
+    def multi_status(message, data):
+        return jsonify({'message': message, 'data': data}), 207
+
     @staticmethod
     def no_content(message, data):
         return jsonify({'message': message, 'data': data}), 204
@@ -18,6 +108,14 @@ class CustomResponse:
     def bad_request(message, data):
         return jsonify({'message': message, 'data': data}), 400
 
+    @staticmethod
+    def conflict(message, data):
+        return jsonify({'message': message, 'data': data}), 409
+
+    @staticmethod
+    def payload_too_large(message, data):
+        return jsonify({'message': message, 'data': data}), 413
+
     @staticmethod
     def unprocessable_content(message, data):
         return jsonify({'message': message, 'data': data}), 422
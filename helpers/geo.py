@@ -0,0 +1,62 @@
+import math
+
+from models.storage_model import StorageGroup, db
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(longitude1, latitude1, longitude2, latitude2):
+    """
+    Great-circle distance in kilometers between two points given in degrees.
+    """
+    longitude1, latitude1, longitude2, latitude2 = map(math.radians, [longitude1, latitude1, longitude2, latitude2])
+    a = math.sin((latitude2 - latitude1) / 2) ** 2 + \
+        math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(longitude, latitude, radius):
+    """
+    Smallest longitude/latitude box containing every point within radius kilometers.
+
+    :return: (min_longitude, max_longitude, min_latitude, max_latitude), the longitude bounds are None
+        when the box reaches a pole or crosses the antimeridian
+    """
+    delta_latitude = math.degrees(radius / EARTH_RADIUS_KM)
+    min_latitude, max_latitude = latitude - delta_latitude, latitude + delta_latitude
+    if min_latitude <= -90 or max_latitude >= 90:
+        return None, None, max(min_latitude, -90), min(max_latitude, 90)
+
+    delta_longitude = math.degrees(radius / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    min_longitude, max_longitude = longitude - delta_longitude, longitude + delta_longitude
+    if min_longitude < -180 or max_longitude > 180:
+        return None, None, min_latitude, max_latitude
+
+    return min_longitude, max_longitude, min_latitude, max_latitude
+
+
+def nearby_storage_groups(longitude, latitude, radius=None):
+    """
+    Distance in kilometers to every storage group within radius kilometers, nearest first.
+
+    The radius is turned into a bounding box matched against the (latitude, longitude) index, so only
+    the storage groups inside the box are loaded and measured.
+
+    :return: dict of storage group id to distance
+    """
+    storage_groups = db.session.query(StorageGroup.id, StorageGroup.longitude, StorageGroup.latitude)
+
+    if radius is not None:
+        min_longitude, max_longitude, min_latitude, max_latitude = bounding_box(longitude, latitude, radius)
+        storage_groups = storage_groups.filter(StorageGroup.latitude.between(min_latitude, max_latitude))
+        if min_longitude is not None:
+            storage_groups = storage_groups.filter(StorageGroup.longitude.between(min_longitude, max_longitude))
+
+    distances = [
+        (storage_group_id, haversine(longitude, latitude, storage_group_longitude, storage_group_latitude))
+        for storage_group_id, storage_group_longitude, storage_group_latitude in storage_groups
+    ]
+    if radius is not None:
+        distances = [(storage_group_id, distance) for storage_group_id, distance in distances if distance <= radius]
+
+    return dict(sorted(distances, key=lambda item: item[1]))
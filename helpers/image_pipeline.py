@@ -0,0 +1,138 @@
+import logging
+from uuid import uuid4
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+
+# variant: longest edge in pixels, images smaller than that are re-encoded at their own size
+VARIANTS = {
+    'thumb': 256,
+    'medium': 1024,
+    'full': 2048,
+}
+
+# (extension, Pillow format, mimetype, save options), in order of preference
+FORMATS = [
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+ALLOWED_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF'}
+
+logger = logging.getLogger(__name__)
+
+_settings = {'executor': None, 'maxPixels': 0}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def validate_image(path):
+    """
+    Check that the file at path is an image of an allowed format without decoding its pixels.
+
+    :return: the Pillow format of the image
+    :raise InvalidImage: the file is not an image, is of another format or has too many pixels to decode
+    """
+    try:
+        with PILImage.open(path) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise InvalidImage(f"Unsupported image format {image.format}")
+            if image.width * image.height > _settings['maxPixels']:
+                raise InvalidImage(f"Image of {image.width}x{image.height} pixels is too large")
+            image.verify()
+            return image.format
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise InvalidImage("Not a valid image") from e
+
+
+def variant_path(path, variant, extension):
+    path = Path(path)
+    return path.with_name(f'{path.stem}.{variant}.{extension}')
+
+
+def variant_paths(path):
+    return [variant_path(path, variant, extension) for variant in VARIANTS for extension, *_ in FORMATS]
+
+
+def failure_path(path):
+    """
+    Marker next to an original that could not be processed, so it is not decoded again on every request.
+    """
+    path = Path(path)
+    return path.with_name(f'{path.stem}.invalid')
+
+
+def process_image(path, variants=tuple(VARIANTS)):
+    """
+    Write the variants of the image at path in every format, next to it.
+
+    Orientation is applied to the pixels and the image is re-encoded without its EXIF, ICC or other
+    metadata. Each variant is written to a temporary name first so readers never see a partial file.
+    """
+    with PILImage.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = PILImage.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+
+    for variant in variants:
+        resized = image.copy()
+        resized.thumbnail((VARIANTS[variant], VARIANTS[variant]), PILImage.Resampling.LANCZOS)
+
+        for extension, image_format, _, options in FORMATS:
+            destination = variant_path(path, variant, extension)
+            temporary = destination.with_name(f'.{destination.name}.{uuid4().hex}.tmp')
+            resized.save(temporary, format=image_format, **options)
+            temporary.replace(destination)
+
+
+def log_failure(path, future):
+    if future.exception():
+        logger.error(f"Processing image {path} failed", exc_info=future.exception())
+
+
+def submit_image(path, variants=tuple(VARIANTS)):
+    """
+    Generate the variants of the image at path in the IMAGE_WORKERS pool, off the request thread.
+    """
+    future = _settings['executor'].submit(process_image, path, variants)
+    future.add_done_callback(lambda done: log_failure(path, done))
+    return future
+
+
+def missing_variants(path):
+    return [
+        variant for variant in VARIANTS
+        if not all(variant_path(path, variant, extension).exists() for extension, *_ in FORMATS)
+    ]
+
+
+def best_variant(path, variant, accept_mimetypes):
+    """
+    The path and mimetype of the variant in the best format the client accepts, or of the full variant while
+    that one is still being generated. The original, which still holds its metadata, is never served.
+
+    :return: (path, mimetype, whether it is the requested variant), (None, None, False) without any variant
+    """
+    for candidate_variant in dict.fromkeys([variant, 'full']):
+        for extension, _, mimetype, _ in FORMATS:
+            if accept_mimetypes[mimetype] or extension == FORMATS[-1][0]:
+                candidate = variant_path(path, candidate_variant, extension)
+                if candidate.exists():
+                    return candidate, mimetype, candidate_variant == variant
+
+    return None, None, False
+
+
+def init_app(app):
+    _settings['maxPixels'] = app.config['IMAGE_MAX_PIXELS']
+    if _settings['executor'] is None:
+        _settings['executor'] = ThreadPoolExecutor(
+            max_workers=app.config['IMAGE_WORKERS'], thread_name_prefix='image-pipeline')
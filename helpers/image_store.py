@@ -0,0 +1,290 @@
+import os
+import hashlib
+import mimetypes
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+from flask import current_app, request, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
+
+from helpers.image_pipeline import (
+    InvalidImage, failure_path, missing_variants, process_image, submit_image, validate_image, variant_paths
+)
+from helpers.response_cache import LocalCache
+from models.database import UPSERT_DIALECTS
+from models.image_model import Image, db
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'MPO': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'GIF': 'gif',
+}
+
+_settings = {'locations': None, 'ttl': 0}
+
+
+class HashedUpload:
+    """
+    Temporary file under IMAGE_DIR that an uploaded file is streamed into chunk by chunk, hashing the
+    chunks on the way and refusing to grow past max_size.
+    """
+    def __init__(self, directory, max_size):
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.max_size = max_size
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise RequestEntityTooLarge(f"An image can be at most {self.max_size} bytes")
+
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    @property
+    def path(self):
+        return Path(self.file.name)
+
+    def discard(self):
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+
+def receive_uploads(field):
+    """
+    Stream the files of the multipart form field to temporary files, without buffering them in memory.
+
+    Requests announcing more than MAX_CONTENT_LENGTH bytes are rejected before anything is read.
+
+    :return: list of (filename, HashedUpload)
+    :raise RequestEntityTooLarge: the request or one of its files is over the limits
+    """
+    directory = Path(current_app.config['IMAGE_DIR'])
+    directory.mkdir(parents=True, exist_ok=True)
+    uploads = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        upload = HashedUpload(directory, current_app.config['IMAGE_MAX_BYTES'])
+        uploads.append(upload)
+        return upload
+
+    parser = FormDataParser(
+        stream_factory=stream_factory,
+        max_content_length=request.max_content_length,
+        max_form_memory_size=request.max_form_memory_size,
+    )
+    try:
+        _, _, files = parser.parse(request.stream, request.mimetype, request.content_length, request.mimetype_params)
+    except Exception:
+        for upload in uploads:
+            upload.discard()
+        raise
+
+    received = [(file.filename, file.stream) for file in files.getlist(field)]
+    for upload in uploads:
+        upload.file.close()
+        if all(upload is not stream for _, stream in received):
+            upload.discard()
+
+    return received
+
+
+def content_path(digest, extension):
+    """
+    IMAGE_DIR/ab/cd/abcd....jpg, sharded on the first bytes of the sha256 so no directory grows too large.
+    """
+    return Path(current_app.config['IMAGE_DIR']) / digest[:2] / digest[2:4] / f'{digest}.{extension}'
+
+
+def store_image(filename, upload):
+    """
+    Store an uploaded image under its content hash, or count one more reference to the same image
+    when it is already stored. Joins the caller's transaction, commit it before calling publish_image.
+
+    :raise InvalidImage: the upload is not an image of a supported format
+    """
+    try:
+        image_format = validate_image(upload.path)
+    except Exception:
+        upload.discard()
+        raise
+
+    digest = upload.sha256.hexdigest()
+    path = content_path(digest, EXTENSIONS[image_format])
+
+    now = datetime.now()
+    dialect = db.session.get_bind().dialect.name
+    if dialect in UPSERT_DIALECTS:
+        statement = UPSERT_DIALECTS[dialect](Image).values(
+            filename=filename, filepath=str(path), hash=digest, refCount=1, createdTime=now, updatedTime=now)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['hash'], set_={'refCount': Image.refCount + 1, 'updatedTime': now}))
+    elif not db.session.query(Image).filter(Image.hash == digest).update(
+            {'refCount': Image.refCount + 1, 'updatedTime': now}, synchronize_session=False):
+        db.session.add(Image(filename=filename, filepath=str(path), hash=digest, refCount=1))
+
+    return db.session.query(Image).filter(Image.hash == digest).populate_existing().one()
+
+
+def publish_image(image, upload):
+    """
+    Move a stored upload to its content addressed path and generate its variants, unless an identical
+    upload already did.
+    """
+    path = Path(image.filepath)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(upload.path, path)
+    prepare_image(path)
+
+
+def prepare_image(path):
+    """
+    Write the full variant of the image at path now, stripped of its metadata, and leave the smaller
+    variants to the IMAGE_WORKERS pool, so the image can be served as soon as this returns.
+
+    :raise InvalidImage: the file at path is not an image that can be processed
+    """
+    variants = missing_variants(path)
+    if 'full' in variants:
+        process_original(path, ['full'])
+
+    variants = [variant for variant in variants if variant != 'full']
+    if variants:
+        submit_image(path, variants)
+
+
+def process_original(path, variants):
+    """
+    Write variants of the original at path, remembering the originals that are not valid images, like the
+    files uploaded before uploads were validated, so they are tried once rather than on every request.
+
+    :raise InvalidImage: the original is not a valid image, now or when it was tried before
+    """
+    failure = failure_path(path)
+    if failure.exists():
+        raise InvalidImage("Not a valid image")
+
+    # an OSError with an errno is the filesystem failing rather than the image, it is tried again next time
+    try:
+        validate_image(path)
+        process_image(path, variants)
+    except InvalidImage as e:
+        if isinstance(e.__cause__, OSError) and e.__cause__.errno is not None:
+            raise
+        failure.touch()
+        raise
+    except OSError as e:
+        if e.errno is not None:
+            raise
+        failure.touch()
+        raise InvalidImage("Not a valid image") from e
+
+
+def prepare_stored_images():
+    """
+    Generate the missing variants of every stored image, for images uploaded before variants existed or
+    whose processing failed or was lost with a restart. Files that cannot be processed are logged and
+    skipped.
+
+    :return: (the number of images processed, the number of files skipped)
+    """
+    processed, skipped = 0, 0
+    for filepath, in db.session.query(Image.filepath).order_by(Image.id).yield_per(1000):
+        variants = missing_variants(filepath)
+        if not variants or not Path(filepath).exists() or failure_path(filepath).exists():
+            continue
+
+        try:
+            process_original(filepath, variants)
+        except (InvalidImage, OSError) as e:
+            current_app.logger.warning(f"Skipped image {filepath}: {e}")
+            skipped += 1
+        else:
+            processed += 1
+
+    return processed, skipped
+
+
+def release_image(image):
+    """
+    Drop one reference to an image, deleting its row and files with the last one.
+    """
+    image_id, filepath = image.id, image.filepath
+    db.session.query(Image).filter(Image.id == image_id).update(
+        {'refCount': Image.refCount - 1, 'updatedTime': datetime.now()}, synchronize_session=False)
+    removed = db.session.query(Image).filter(Image.id == image_id, Image.refCount <= 0).delete(
+        synchronize_session=False)
+    db.session.commit()
+    forget_image(image_id)
+
+    if removed:
+        Path(filepath).unlink(missing_ok=True)
+        failure_path(filepath).unlink(missing_ok=True)
+        for path in variant_paths(filepath):
+            path.unlink(missing_ok=True)
+
+    return bool(removed)
+
+
+def locate_image(image_id):
+    """
+    The path of the image, from the IMAGE_LOOKUP_SIZE entries LRU when it was looked up in the last
+    IMAGE_LOOKUP_TTL seconds, so serving a popular image does not touch the database.
+
+    :return: None when there is no such image
+    """
+    key = str(image_id)
+    filepath = _settings['locations'].get(key)
+    if filepath is None:
+        filepath = db.session.query(Image.filepath).filter(Image.id == image_id).scalar()
+        if filepath is None:
+            return None
+        _settings['locations'].set(key, filepath, _settings['ttl'])
+
+    return filepath
+
+
+def forget_image(image_id):
+    _settings['locations'].delete(str(image_id))
+
+
+def send_image(path, mimetype, immutable):
+    """
+    Response serving the image file at path, conditional and with range support.
+
+    Stored files are named after the sha256 of the upload, variants after their original, so the file
+    name is the ETag. Immutable files are cached for IMAGE_MAX_AGE, the others are revalidated on every
+    use. With IMAGE_SENDFILE set the response only names the file and the fronting server sends it.
+    """
+    path = Path(path)
+    mimetype = mimetype or mimetypes.guess_type(path.name)[0]
+    max_age = current_app.config['IMAGE_MAX_AGE'] if immutable else 0
+
+    if current_app.config['IMAGE_SENDFILE'] == 'x-accel':
+        location = Path(os.path.relpath(path, current_app.config['IMAGE_DIR'])).as_posix()
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config['IMAGE_ACCEL_PREFIX'].rstrip('/') + '/' + location
+        response.set_etag(path.name)
+        response = response.make_conditional(request)
+    else:
+        response = send_file(path, mimetype=mimetype, etag=path.name, conditional=True, max_age=max_age)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    response.cache_control.no_cache = None if immutable else True
+
+    return response
+
+
+def init_app(app):
+    _settings['locations'] = LocalCache(app.config['IMAGE_LOOKUP_SIZE'])
+    _settings['ttl'] = app.config['IMAGE_LOOKUP_TTL']
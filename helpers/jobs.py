@@ -0,0 +1,166 @@
+import os
+import socket
+import time
+import traceback
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from helpers.commodity_lifecycle import expire_commodities
+from models.database import UPSERT_DIALECTS
+from models.job_model import JobLock, JobMetric, db
+
+LEADER_LOCK = 'scheduler'
+
+
+def update_commodity_status(app):
+    transitioned = expire_commodities()
+    if any(transitioned.values()):
+        app.logger.info(f"Commodity status updated: {transitioned}")
+
+
+# (name, function of the app, config key of the interval in seconds)
+JOBS = [
+    ('update_commodity_status', update_commodity_status, 'COMMODITY_EXPIRY_INTERVAL'),
+]
+
+
+def acquire_lock(name, owner, seconds, now=None):
+    """
+    Take or renew the lease on the named lock for seconds, unless another owner holds an unexpired one.
+
+    The lease is a single atomic statement, so any number of workers can race for it and exactly one wins.
+
+    :return: whether owner holds the lock now
+    """
+    now = now or datetime.now()
+    expire_time = now + timedelta(seconds=seconds)
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        acquired = db.session.query(JobLock).filter(
+            JobLock.name == name, (JobLock.owner == owner) | (JobLock.expireTime < now)
+        ).update({'owner': owner, 'expireTime': expire_time, 'updatedTime': now}, synchronize_session=False)
+        if not acquired and not db.session.query(JobLock).filter(JobLock.name == name).count():
+            db.session.add(JobLock(name=name, owner=owner, expireTime=expire_time))
+            acquired = 1
+        db.session.commit()
+        return bool(acquired)
+
+    statement = UPSERT_DIALECTS[dialect](JobLock).values(
+        name=name, owner=owner, expireTime=expire_time, createdTime=now, updatedTime=now)
+    statement = statement.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'owner': owner, 'expireTime': expire_time, 'updatedTime': now},
+        where=(JobLock.owner == owner) | (JobLock.expireTime < now)
+    )
+    acquired = db.session.execute(statement).rowcount
+    db.session.commit()
+    return bool(acquired)
+
+
+def release_lock(name, owner):
+    db.session.query(JobLock).filter(JobLock.name == name, JobLock.owner == owner).update(
+        {'expireTime': datetime.now()}, synchronize_session=False)
+    db.session.commit()
+
+
+def record_run(name, start_time, duration, error=None):
+    metric = db.session.query(JobMetric).filter(JobMetric.name == name).first()
+    if not metric:
+        metric = JobMetric(name=name, runNum=0, failureNum=0, maxDuration=0.0, totalDuration=0.0)
+        db.session.add(metric)
+
+    metric.runNum += 1
+    metric.failureNum += 1 if error else 0
+    metric.lastStartTime = start_time
+    metric.lastDuration = duration
+    metric.maxDuration = max(metric.maxDuration, duration)
+    metric.totalDuration += duration
+    metric.lastError = error
+    db.session.commit()
+
+
+def job_metrics():
+    return {
+        metric.name: {
+            'runNum': metric.runNum,
+            'failureNum': metric.failureNum,
+            'lastStartTime': metric.lastStartTime.isoformat() if metric.lastStartTime else None,
+            'lastDuration': metric.lastDuration,
+            'meanDuration': metric.totalDuration / metric.runNum if metric.runNum else None,
+            'maxDuration': metric.maxDuration,
+            'lastError': metric.lastError,
+        }
+        for metric in db.session.query(JobMetric).order_by(JobMetric.name)
+    }
+
+
+class JobWorker:
+    """
+    Runs the periodic JOBS, in whichever worker process currently leads.
+
+    Every worker renews or competes for the JOB_LEASE_SECONDS lease on the scheduler lock a few times per
+    lease, and only the holder runs jobs, so a job is never run by two processes and another worker takes
+    over within one lease of the leader dying. Within the leader, max_instances=1 keeps a slow run from
+    overlapping the next one and JOB_JITTER spreads the runs of workers started together.
+    """
+    def __init__(self, app, blocking=True):
+        self.app = app
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+        self.lease_seconds = app.config['JOB_LEASE_SECONDS']
+        self.lease_expire = 0.0
+        self.scheduler = BlockingScheduler() if blocking else BackgroundScheduler()
+
+        self.scheduler.add_job(
+            self.renew_lease, 'interval', seconds=self.lease_seconds / 3,
+            next_run_time=datetime.now(), max_instances=1, coalesce=True, id='renew_lease'
+        )
+        for name, function, interval in JOBS:
+            self.scheduler.add_job(
+                self.run, 'interval', args=[name, function], seconds=app.config[interval],
+                jitter=app.config['JOB_JITTER'], max_instances=1, coalesce=True, id=name
+            )
+
+    def is_leader(self):
+        return time.monotonic() < self.lease_expire
+
+    def renew_lease(self):
+        renewed_at = time.monotonic()
+        with self.app.app_context():
+            acquired = acquire_lock(LEADER_LOCK, self.owner, self.lease_seconds)
+
+        if acquired and not self.is_leader():
+            self.app.logger.info(f"Job worker {self.owner} is now the leader")
+        self.lease_expire = renewed_at + self.lease_seconds if acquired else 0.0
+
+    def run(self, name, function):
+        if not self.is_leader():
+            return
+
+        with self.app.app_context():
+            start_time, started = datetime.now(), time.perf_counter()
+            error = None
+            try:
+                function(self.app)
+            except Exception:
+                db.session.rollback()
+                error = traceback.format_exc()
+                self.app.logger.error(f"Job {name} failed\n{error}")
+
+            record_run(name, start_time, time.perf_counter() - started, error)
+
+    def start(self):
+        try:
+            self.scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            self.stop()
+
+    def stop(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+
+        with self.app.app_context():
+            release_lock(LEADER_LOCK, self.owner)
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from flask_migrate import Migrate, stamp, upgrade
+from sqlalchemy import inspect
+
+from models.database import db
+
+BASELINE_REVISION = '0001'
+
+
+def include_object(object_, name, type_, reflected, compare_to):
+    # commodity_fts and its shadow tables belong to the optional FTS5 search backend, see helpers/search_fts
+    return not (type_ == 'table' and name.startswith('commodity_fts'))
+
+
+migrate = Migrate(directory=str(Path(__file__).resolve().parent.parent / 'migrations'), include_object=include_object)
+
+
+def upgrade_database():
+    """
+    Upgrade the database to the latest migration.
+
+    Databases created by db.create_all before migrations existed hold the baseline schema without an
+    alembic_version table, they are stamped at the baseline revision first.
+    """
+    tables = inspect(db.engine).get_table_names()
+    if 'commodity' in tables and 'alembic_version' not in tables:
+        stamp(revision=BASELINE_REVISION)
+
+    upgrade()
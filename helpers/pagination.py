@@ -0,0 +1,75 @@
+import json
+import base64
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_limit():
+    """
+    The limit query argument, defaulting to PAGE_LIMIT_DEFAULT and capped at PAGE_LIMIT_MAX.
+    """
+    limit = request.args.get('limit', current_app.config['PAGE_LIMIT_DEFAULT'], type=int)
+    return max(1, min(limit, current_app.config['PAGE_LIMIT_MAX']))
+
+
+def encode_cursor(item):
+    position = json.dumps([item.createdTime.isoformat(), item.id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    :raise InvalidCursor: the cursor was not made by encode_cursor
+    """
+    try:
+        created_time, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_time), int(id_)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor {cursor}") from e
+
+
+def after_cursor(query, model):
+    if not request.args.get('cursor'):
+        return query
+
+    # the createdTime >= bound lets the createdTime index seek to the cursor, the OR alone only filters a
+    # scan of the index from its start
+    created_time, id_ = decode_cursor(request.args['cursor'])
+    return query.filter(
+        model.createdTime >= created_time,
+        or_(model.createdTime > created_time, model.id > id_)
+    )
+
+
+def paginate(query, model):
+    """
+    Keyset pagination over (createdTime, id), driven by the cursor and limit query arguments.
+
+    The cursor is the position of the last item of the previous page, so every page is an index range
+    scan no matter how deep the client has paged.
+
+    :return: (items, cursor of the next page or None on the last page)
+    """
+    limit = page_limit()
+
+    items = after_cursor(query, model).order_by(model.createdTime, model.id).limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, encode_cursor(items[-1])
+
+
+def iterate(query, model):
+    """
+    Every item after the cursor in (createdTime, id) order, fetched STREAM_BATCH_SIZE rows at a time for
+    exports that would not fit a page. The limit query argument does not apply.
+    """
+    query = after_cursor(query, model).order_by(model.createdTime, model.id)
+    return query.yield_per(current_app.config['STREAM_BATCH_SIZE'])
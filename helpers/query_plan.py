@@ -0,0 +1,120 @@
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from helpers.commodity_lifecycle import expire_commodities
+from models.database import db
+
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)')
+# index forms of SCAN listing the constraints they search the index with
+CONSTRAINED_SCAN = re.compile(r'\bINDEX\b.*\(')
+ORDERED_INDEX_SCAN = re.compile(r'^SCAN \S+ USING (COVERING )?INDEX ')
+
+COMMODITY = {
+    'giverId': 'giver', 'storageGroupId': 1, 'name': '木頭椅子', 'description': '可以坐的椅子',
+    'category': 'furniture', 'condition': 'good', 'images': [],
+}
+
+# (label, method, url, json body), requests answered with a nextCursor are followed one page further
+QUERY_PLAN_REQUESTS = [
+    ('post_storage_group', 'POST', '/api/storage/storage_group', {'name': 'group', 'longitude': 121.5, 'latitude': 25.0}),
+    ('post_storage', 'POST', '/api/storage/storage', {'storageGroupId': 1}),
+    ('post_storage', 'POST', '/api/storage/storage', {'storageGroupId': 1}),
+    ('post_commodity', 'POST', '/api/commodity/commodity', COMMODITY),
+    ('post_commodity', 'POST', '/api/commodity/commodity', COMMODITY),
+    ('post_record', 'POST', '/api/record/record',
+     {'userId': 'giver', 'role': 'giver', 'commodityId': 1, 'reward': 5, 'reason': 'report'}),
+    ('get_commodity', 'GET', '/api/commodity/commodity/1', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?limit=1', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?status=giving&limit=1', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?giverId=giver&limit=1', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?receiverId=receiver', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?storageGroupId=1&limit=1', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?keyword=椅子&status=giving', None),
+    ('get_commodities', 'GET', '/api/commodity/commodity?longitude=121.5&latitude=25.0&radius=5&keyword=椅子', None),
+    ('patch_commodity', 'PATCH', '/api/commodity/commodity/1', {'status': 'receiving', 'receiverId': 'receiver'}),
+    ('patch_commodity', 'PATCH', '/api/commodity/commodity/1', {'status': 'finished', 'name': '椅子'}),
+    ('get_storage_group', 'GET', '/api/storage/storage_group/1', None),
+    ('get_storage_groups', 'GET', '/api/storage/storage_group?limit=1', None),
+    ('get_storage_groups', 'GET', '/api/storage/storage_group?embed=storages', None),
+    ('get_storage', 'GET', '/api/storage/storage/1', None),
+    ('get_storages', 'GET', '/api/storage/storage?storageGroupId=1&limit=1', None),
+    ('get_records', 'GET', '/api/record/record?limit=1', None),
+    ('get_record', 'GET', '/api/record/record/giver', None),
+    ('get_reputation_batch', 'GET', '/api/record/reputation?userId=giver&userId=receiver', None),
+]
+
+
+def full_scans(statement, details):
+    """
+    The details of the query plan of statement that read a whole table or index.
+
+    Walking an index in ORDER BY order stops after LIMIT rows when no WHERE filters them, like the first
+    page of a list, so that scan is bounded and left out.
+    """
+    bounded = re.search(r'\bLIMIT\b', statement) and not re.search(r'\bWHERE\b', statement) \
+        and not any('TEMP B-TREE' in detail for detail in details)
+
+    return [
+        detail for detail in details
+        if FULL_SCAN.match(detail) and not CONSTRAINED_SCAN.search(detail)
+        and not (bounded and ORDERED_INDEX_SCAN.match(detail))
+    ]
+
+
+@contextmanager
+def capture_statements(engine, statements, label):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((label[0], statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def check_query_plans(app):
+    """
+    Run the QUERY_PLAN_REQUESTS and the expiry job against the SQLite database of app, and EXPLAIN QUERY
+    PLAN every statement they issued.
+
+    :return: list of (label, statement, plan detail) for every full table scan
+    """
+    client = app.test_client()
+    statements = []
+    label = ['']
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            raise RuntimeError(f'Query plans are checked on SQLite, not {engine.dialect.name}')
+
+        with capture_statements(engine, statements, label):
+            for label[0], method, url, body in QUERY_PLAN_REQUESTS:
+                response = client.open(url, method=method, json=body)
+                cursor = (response.get_json(silent=True) or {}).get('nextCursor')
+                if cursor:
+                    client.open(f'{url}&cursor={cursor}', method=method)
+
+            label[0] = 'expire_commodities'
+            expire_commodities()
+
+        scans = []
+        connection = engine.raw_connection()
+        try:
+            explained = set()
+            for label_, statement, parameters in statements:
+                if (label_, statement) in explained:
+                    continue
+                explained.add((label_, statement))
+
+                plan = connection.cursor().execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                details = [detail for _, _, _, detail in plan]
+                scans.extend((label_, statement, detail) for detail in full_scans(statement, details))
+        finally:
+            connection.close()
+
+    return scans
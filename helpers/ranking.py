@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def rank(importance, distance, limit=None):
+    """
+    Order rows by importance, highest first, then by distance, nearest first.
+
+    With a limit, only the rows that can reach the top-k by importance are sorted, selected with
+    argpartition, instead of sorting every row.
+
+    :return: array of row indices, at most limit of them
+    """
+    importance = -np.asarray(importance, dtype=np.float64)
+    distance = np.asarray(distance, dtype=np.float64)
+
+    if limit is None or limit >= len(importance):
+        return np.lexsort((distance, importance))
+
+    if limit <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    threshold = importance[np.argpartition(importance, limit - 1)[limit - 1]]
+    candidates = np.flatnonzero(importance <= threshold)
+    order = candidates[np.lexsort((distance[candidates], importance[candidates]))]
+    return order[:limit]
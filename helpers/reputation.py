@@ -0,0 +1,117 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, literal, text
+
+from models.database import UPSERT_DIALECTS
+from models.record_model import Record, UserReputation, db
+
+
+def reputation(record_num, reward_sum, report_num):
+    if not record_num:
+        return {
+            'recordNum': 0,
+            'meanReward': 5,
+            'reportNum': 0,
+            'evaluation': 'good'
+        }
+
+    return {
+        'recordNum': record_num,
+        'meanReward': reward_sum / record_num,
+        'reportNum': report_num,
+        'evaluation': 'good' if report_num < record_num * 0.1 else 'bad'
+    }
+
+
+def add_record(record):
+    """
+    Count a new record into the reputation of its user.
+
+    The upsert joins the caller's transaction, commit it together with the record so the summary
+    never drifts from the record table.
+    """
+    now = datetime.now()
+    values = {
+        'recordNum': 1,
+        'rewardSum': record.reward,
+        'reportNum': 1 if record.reason == 'report' else 0,
+    }
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        updated = db.session.query(UserReputation).filter(UserReputation.userId == record.userId).update({
+            getattr(UserReputation, key): getattr(UserReputation, key) + value for key, value in values.items()
+        } | {UserReputation.updatedTime: now}, synchronize_session=False)
+        if not updated:
+            db.session.add(UserReputation(userId=record.userId, **values))
+        return
+
+    statement = UPSERT_DIALECTS[dialect](UserReputation).values(
+        userId=record.userId, createdTime=now, updatedTime=now, **values)
+    statement = statement.on_conflict_do_update(index_elements=['userId'], set_={
+        key: getattr(UserReputation, key) + getattr(statement.excluded, key) for key in values
+    } | {'updatedTime': now})
+    db.session.execute(statement)
+
+
+def get_reputations(user_ids):
+    """
+    Reputation of every given user, read from the user_reputation summary by its unique userId.
+
+    :return: dict of user id to reputation, users without records get the default reputation
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    summaries = db.session.query(
+        UserReputation.userId, UserReputation.recordNum, UserReputation.rewardSum, UserReputation.reportNum
+    ).filter(UserReputation.userId.in_(user_ids)).all()
+
+    reputations = {user_id: reputation(0, 0, 0) for user_id in user_ids}
+    for user_id, record_num, reward_sum, report_num in summaries:
+        reputations[user_id] = reputation(record_num, reward_sum, report_num)
+
+    return reputations
+
+
+def rebuild_reputations():
+    """
+    Recompute user_reputation from the record table, answered from the (userId, reason, reward) index.
+
+    The summary is deleted and aggregated back from the records with a single INSERT ... SELECT, in one
+    write transaction. Record inserts cannot interleave with it: it holds the SQLite write lock, and on
+    Postgres a SHARE lock on the record table. A record posted meanwhile is either counted by the rebuild
+    or added to its result by add_record once the rebuild commits.
+
+    :return: the user ids whose stored summary did not match the records
+    """
+    summary = (UserReputation.userId, UserReputation.recordNum, UserReputation.rewardSum, UserReputation.reportNum)
+    bind = db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE record IN SHARE MODE'))
+
+    if bind.dialect.delete_returning:
+        stored = db.session.execute(db.delete(UserReputation).returning(*summary)).all()
+    else:
+        stored = db.session.query(*summary).all()
+        db.session.query(UserReputation).delete(synchronize_session=False)
+
+    now = literal(datetime.now(), db.DateTime)
+    db.session.execute(db.insert(UserReputation).from_select(
+        ['userId', 'recordNum', 'rewardSum', 'reportNum', 'createdTime', 'updatedTime'],
+        db.select(
+            Record.userId,
+            func.count(),
+            func.sum(Record.reward),
+            func.sum(case((Record.reason == 'report', 1), else_=0)),
+            now,
+            now
+        ).group_by(Record.userId)
+    ))
+    rebuilt = db.session.query(*summary).all()
+    db.session.commit()
+
+    stored = {user_id: tuple(values) for user_id, *values in stored}
+    rebuilt = {user_id: tuple(values) for user_id, *values in rebuilt}
+    return sorted(
+        user_id for user_id in stored.keys() | rebuilt.keys()
+        if stored.get(user_id) != rebuilt.get(user_id)
+    )
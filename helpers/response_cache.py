@@ -0,0 +1,227 @@
+import json
+import time
+import threading
+from functools import wraps
+from urllib.parse import urlencode
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.database import db
+
+
+class LocalCache:
+    """
+    Thread safe LRU of at most size entries, each dropped once its ttl has passed.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class MemoryBackend:
+    """
+    In-process stand-in for the redis client, implementing the part of its API the response cache uses.
+    """
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            value, expires = self._values.get(name, (None, None))
+            if expires is not None and expires < time.monotonic():
+                del self._values[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._values[name] = (value, time.monotonic() + ex if ex else None)
+
+    def incr(self, name):
+        with self._lock:
+            value, expires = self._values.get(name, (0, None))
+            self._values[name] = (int(value) + 1, expires)
+            return int(value) + 1
+
+
+def shared_backend(url):
+    if not url:
+        return None
+
+    if url == 'memory://':
+        return MemoryBackend()
+
+    import redis
+    return redis.Redis.from_url(url)
+
+
+class ResponseCache:
+    """
+    Cache of JSON responses, keyed by namespace version, path and query arguments.
+
+    Responses are looked up in the in-process LRU first, then in the shared backend of RESPONSE_CACHE_URL.
+    Invalidating a namespace bumps its version, which the shared backend holds so every worker and the job
+    worker stop serving the old entries at once. Without RESPONSE_CACHE_URL the cache is off, since a
+    version bumped in one process would never reach the others.
+    """
+    def __init__(self, app):
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        self.local = LocalCache(app.config['RESPONSE_CACHE_SIZE'])
+        self.shared = shared_backend(app.config['RESPONSE_CACHE_URL'])
+        self.enabled = bool(self.ttl) and self.shared is not None
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace):
+        return int(self.shared.get(f'version:{namespace}') or 0)
+
+    def invalidate(self, namespace):
+        if self.shared is not None:
+            self.shared.incr(f'version:{namespace}')
+
+    def key(self, namespace):
+        # behind conditional the ETag of the current rows is part of the key, entries cached before a write
+        # whose invalidation has not reached this process yet are then missed instead of served
+        arguments = urlencode(sorted(request.args.items(multi=True)))
+        return f'{namespace}:{self.version(namespace)}:{g.get("etag", "")}:{request.path}?{arguments}'
+
+    def get(self, key):
+        payload = self.local.get(key)
+        if payload is None:
+            value = self.shared.get(key)
+            if value is not None:
+                payload = json.loads(value)
+                self.local.set(key, payload, self.ttl)
+        return payload
+
+    def set(self, key, payload):
+        self.local.set(key, payload, self.ttl)
+        self.shared.set(key, json.dumps(payload), ex=self.ttl)
+
+    def count(self, route, outcome):
+        with self._lock:
+            counts = self._metrics.setdefault(route, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                route: {**counts, 'hitRate': counts['hits'] / (counts['hits'] + counts['misses'])}
+                for route, counts in self._metrics.items()
+            }
+
+
+def invalidate_on_commit(*namespaces):
+    """
+    Invalidate the namespaces once the current database transaction commits, for writes made outside of
+    a view decorated with invalidates. Invalidating earlier would let a concurrent read cache the old
+    rows again under the new version.
+    """
+    db.session.info.setdefault('invalidateNamespaces', set()).update(namespaces)
+
+
+def invalidate_committed(session):
+    namespaces = session.info.pop('invalidateNamespaces', ())
+    cache = current_app.extensions.get('response_cache') if namespaces else None
+    if cache is not None:
+        for namespace in namespaces:
+            cache.invalidate(namespace)
+
+
+def discard_invalidations(session):
+    session.info.pop('invalidateNamespaces', None)
+
+
+def init_app(app):
+    app.extensions['response_cache'] = ResponseCache(app)
+
+    if not event.contains(Session, 'after_commit', invalidate_committed):
+        event.listen(Session, 'after_commit', invalidate_committed)
+        event.listen(Session, 'after_rollback', discard_invalidations)
+
+
+def cached(namespace, refresh=None):
+    """
+    Serve the successful responses of a GET view from the response cache.
+
+    :param namespace: the namespace the entries are invalidated with
+    :param refresh: recomputes the time dependent fields of the cached data before every response
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or not cache.enabled:
+                return view(*args, **kwargs)
+
+            key = cache.key(namespace)
+            payload = cache.get(key)
+            if payload is not None:
+                cache.count(request.endpoint, 'hits')
+                if refresh is not None:
+                    payload = {**payload, 'data': refresh(payload['data'])}
+
+                response = jsonify(payload)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            cache.count(request.endpoint, 'misses')
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                cache.set(key, response.get_json())
+
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*namespaces):
+    """
+    Invalidate the response cache namespaces once a write view has succeeded.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            cache = current_app.extensions.get('response_cache')
+            if cache is not None and response.status_code < 400:
+                for namespace in namespaces:
+                    cache.invalidate(namespace)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,83 @@
+from sqlalchemy import column, event, literal_column, table, text
+
+from helpers.tokenizer import tokenize, tokenize_query
+from models.commodity_model import Commodity, db
+
+commodity_fts = table('commodity_fts', column('rowid'))
+
+# name matches weigh twice as much as description matches
+COMMODITY_FTS_RANK = literal_column('bm25(commodity_fts, 2.0, 1.0)')
+
+COMMODITY_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS commodity_fts USING fts5(name, description, tokenize = 'unicode61')",
+    """
+    CREATE TRIGGER IF NOT EXISTS commodity_fts_insert AFTER INSERT ON commodity BEGIN
+        INSERT INTO commodity_fts(rowid, name, description)
+        VALUES (new.id, jieba_segment(new.name), jieba_segment(new.description));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS commodity_fts_update AFTER UPDATE OF name, description ON commodity BEGIN
+        UPDATE commodity_fts SET name = jieba_segment(new.name), description = jieba_segment(new.description)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS commodity_fts_delete AFTER DELETE ON commodity BEGIN
+        DELETE FROM commodity_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO commodity_fts(rowid, name, description)
+    SELECT id, jieba_segment(name), jieba_segment(description) FROM commodity
+    WHERE id NOT IN (SELECT rowid FROM commodity_fts)
+    """,
+]
+
+
+def segment(text_):
+    return ' '.join(tokenize(text_ or ''))
+
+
+def register_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function('jieba_segment', 1, segment, deterministic=True)
+
+
+def init_app(app):
+    """
+    Create the commodity_fts table and the triggers mirroring commodity into it.
+
+    SQLite cannot segment Chinese text itself, so the triggers call jieba_segment, a Python function
+    registered on every connection of the engine. Writes to commodity from a connection without it,
+    such as the sqlite3 shell, fail while the triggers exist.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        raise RuntimeError(f"SEARCH_BACKEND 'fts5' requires SQLite, not {engine.dialect.name}")
+
+    event.listen(engine, 'connect', register_functions)
+    engine.dispose()
+
+    with engine.begin() as connection:
+        for statement in COMMODITY_FTS_DDL:
+            connection.execute(text(statement))
+
+
+def search(commodities, keyword, limit=None):
+    """
+    Match the keyword against commodity_fts within the commodities query, in a single statement.
+
+    :return: list of (commodity, score), best first, at most limit of them
+    """
+    terms = set(tokenize_query(keyword))
+    if not terms:
+        return []
+
+    match = ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    matches = commodities.join(commodity_fts, commodity_fts.c.rowid == Commodity.id).filter(
+        text('commodity_fts MATCH :match').bindparams(match=match)).add_columns(
+        -COMMODITY_FTS_RANK).order_by(COMMODITY_FTS_RANK)
+    if limit is not None:
+        matches = matches.limit(limit)
+
+    return matches.all()
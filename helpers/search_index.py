@@ -0,0 +1,114 @@
+import math
+from collections import Counter
+
+from sqlalchemy import case, func
+
+from helpers.counters import add_to_counters, read_counters
+from helpers.tokenizer import tokenize, tokenize_batch, tokenize_query, tokenizer_pool
+from models.commodity_model import Commodity
+from models.counter_model import StatCounter
+from models.search_model import CommodityTerm, db
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# counters of the commodities with postings and of the terms in them, kept by index_commodity
+DOCUMENT_NUM = 'commodity_term.documentNum'
+TERM_NUM = 'commodity_term.termNum'
+
+
+def index_commodity(commodity, terms=None):
+    """
+    Replace the postings of a commodity with the terms of its current name and description.
+
+    The changes join the caller's transaction, commit them together with the commodity itself.
+    """
+    old_posting_num, old_term_num = db.session.query(func.count(), func.sum(CommodityTerm.frequency)).filter(
+        CommodityTerm.commodityId == commodity.id).one()
+    db.session.query(CommodityTerm).filter(CommodityTerm.commodityId == commodity.id).delete(
+        synchronize_session=False)
+
+    if terms is None:
+        terms = tokenize(f'{commodity.name} {commodity.description}')
+
+    frequencies = Counter(terms)
+    db.session.add_all([
+        CommodityTerm(commodityId=commodity.id, term=term, frequency=frequency)
+        for term, frequency in frequencies.items()
+    ])
+    add_to_counters({
+        DOCUMENT_NUM: bool(frequencies) - bool(old_posting_num),
+        TERM_NUM: len(terms) - (old_term_num or 0),
+    })
+
+
+def rebuild_index():
+    db.session.query(CommodityTerm).delete(synchronize_session=False)
+    db.session.query(StatCounter).filter(StatCounter.name.in_([DOCUMENT_NUM, TERM_NUM])).delete(
+        synchronize_session=False)
+
+    commodity_num = 0
+    commodity_batches = db.session.execute(
+        db.select(Commodity).execution_options(yield_per=1000)).scalars().partitions()
+    with tokenizer_pool() as executor:
+        for commodities in commodity_batches:
+            texts = [f'{commodity.name} {commodity.description}' for commodity in commodities]
+            for commodity, terms in zip(commodities, tokenize_batch(texts, executor)):
+                index_commodity(commodity, terms)
+            commodity_num += len(commodities)
+
+    db.session.commit()
+    return commodity_num
+
+
+def corpus_statistics():
+    """
+    Number of indexed commodities and their mean length in terms, read from the counters index_commodity
+    keeps instead of summing every posting.
+    """
+    document_num, term_num = read_counters(DOCUMENT_NUM, TERM_NUM)
+    return document_num, term_num / document_num if document_num else 0.0
+
+
+def search(commodities, keyword, limit=None):
+    """
+    Rank the commodities of the query matching any term of the keyword with BM25, in a single statement.
+
+    The inverse document frequency of each query term is read from the (term, commodityId, frequency)
+    index first, then the postings of the query terms are joined to the commodities and summed per
+    commodity in SQL, with the length of each matching commodity read through the commodityId index,
+    ordered and limited there, so the cost follows the number of matches rather than
+    the size of the catalogue and no list of ids is bound into the statement.
+
+    :return: list of (commodity, score), best first, at most limit of them
+    """
+    terms = set(tokenize_query(keyword))
+    if not terms:
+        return []
+
+    document_frequencies = dict(db.session.query(CommodityTerm.term, func.count()).filter(
+        CommodityTerm.term.in_(terms)).group_by(CommodityTerm.term).all())
+    if not document_frequencies:
+        return []
+
+    document_num, mean_length = corpus_statistics()
+    document_num = max(document_num, *document_frequencies.values())
+    idfs = {
+        term: math.log(1 + (document_num - document_frequency + 0.5) / (document_frequency + 0.5))
+        for term, document_frequency in document_frequencies.items()
+    }
+
+    matched = db.aliased(CommodityTerm)
+    length = db.select(func.sum(CommodityTerm.frequency)).where(
+        CommodityTerm.commodityId == matched.commodityId).scalar_subquery()
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (mean_length or 1.0))
+    score = func.sum(
+        case(idfs, value=matched.term, else_=0.0) * matched.frequency * (BM25_K1 + 1) / (matched.frequency + norm)
+    ).label('score')
+
+    matches = commodities.join(matched, matched.commodityId == Commodity.id).filter(
+        matched.term.in_(idfs)).group_by(Commodity.id).add_columns(score).order_by(score.desc(), Commodity.id)
+    if limit is not None:
+        matches = matches.limit(limit)
+
+    return matches.all()
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from models.storage_model import Storage, db
+
+ALLOCATION_RETRIES = 5
+
+
+class StorageGroupFull(Exception):
+    pass
+
+
+def allocate_storage(storage_group_id, commodity_id):
+    """
+    Claim a free storage of the storage group for the commodity.
+
+    The claim is a conditional UPDATE on commodityId IS NULL, so a storage taken by a concurrent
+    request between picking and claiming it is never handed out twice, the next free one is tried
+    instead. On Postgres the candidate row is also locked with SKIP LOCKED so concurrent donors pick
+    different storages. The claim joins the caller's transaction, commit it together with the commodity.
+
+    :return: the id of the claimed storage
+    :raises StorageGroupFull: when no free storage could be claimed
+    """
+    lock_candidates = db.session.get_bind().dialect.name == 'postgresql'
+
+    for _ in range(ALLOCATION_RETRIES):
+        candidates = db.session.query(Storage.id).filter(
+            Storage.storageGroupId == storage_group_id, Storage.commodityId.is_(None))
+        if lock_candidates:
+            candidates = candidates.with_for_update(skip_locked=True)
+
+        storage_id = candidates.limit(1).scalar()
+        if storage_id is None:
+            raise StorageGroupFull(f'Storage group {storage_group_id} is full')
+
+        claimed = db.session.query(Storage).filter(Storage.id == storage_id, Storage.commodityId.is_(None)).update(
+            {'commodityId': commodity_id, 'updatedTime': datetime.now()}, synchronize_session=False)
+        if claimed:
+            return storage_id
+
+    raise StorageGroupFull(f'Storage group {storage_group_id} is full')
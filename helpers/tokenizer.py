@@ -0,0 +1,71 @@
+from pathlib import Path
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+
+BATCH_CHUNK_SIZE = 64
+
+_settings = {'poolSize': 0}
+
+
+def tokenize(text):
+    return [term.lower() for term in jieba.cut_for_search(text) if any(char.isalnum() for char in term)]
+
+
+@lru_cache(maxsize=1024)
+def _tokenize_query(text):
+    return tuple(tokenize(text))
+
+
+def tokenize_query(text):
+    """
+    Tokenize a search query, memoized since the same few queries make up most of the traffic.
+    """
+    return _tokenize_query(text)
+
+
+@contextmanager
+def tokenizer_pool():
+    """
+    The TOKENIZER_POOL_SIZE processes tokenize_batch spreads documents over, or None without a pool.
+
+    Open it once around a whole bulk indexing run, so the processes and their jieba dictionaries are
+    started once rather than for every batch.
+    """
+    if _settings['poolSize'] <= 1:
+        yield None
+        return
+
+    with ProcessPoolExecutor(max_workers=_settings['poolSize'], initializer=jieba.initialize) as executor:
+        yield executor
+
+
+def tokenize_batch(texts, executor=None):
+    """
+    Tokenize many documents at once, over the processes of executor from tokenizer_pool when given.
+    """
+    if executor is None or len(texts) <= BATCH_CHUNK_SIZE:
+        return [tokenize(text) for text in texts]
+
+    return list(executor.map(tokenize, texts, chunksize=BATCH_CHUNK_SIZE))
+
+
+def init_app(app):
+    """
+    Load the jieba dictionary now rather than on the first search of the worker.
+
+    jieba keeps a marshalled prefix dictionary under JIEBA_CACHE_DIR (the system temp directory when
+    unset), so only the very first start of a host or image pays for building it.
+    """
+    global _tokenize_query
+
+    if app.config['JIEBA_CACHE_DIR']:
+        Path(app.config['JIEBA_CACHE_DIR']).mkdir(parents=True, exist_ok=True)
+        jieba.dt.tmp_dir = app.config['JIEBA_CACHE_DIR']
+
+    jieba.initialize()
+
+    _tokenize_query = lru_cache(maxsize=app.config['TOKENIZER_CACHE_SIZE'])(_tokenize_query.__wrapped__)
+    _settings['poolSize'] = app.config['TOKENIZER_POOL_SIZE']
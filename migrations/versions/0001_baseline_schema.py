@@ -0,0 +1,84 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image',
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('filepath', sa.String(length=255), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('record',
+    sa.Column('userId', sa.Text(), nullable=False),
+    sa.Column('role', sa.Text(), nullable=False),
+    sa.Column('commodityId', sa.Integer(), nullable=False),
+    sa.Column('reward', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.Text(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('storage_group',
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('commodity',
+    sa.Column('giverId', sa.Text(), nullable=False),
+    sa.Column('receiverId', sa.Text(), nullable=True),
+    sa.Column('storageGroupId', sa.Integer(), nullable=False),
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('images', sa.TEXT(), nullable=True),
+    sa.Column('status', sa.Text(), nullable=False),
+    sa.Column('category', sa.Text(), nullable=False),
+    sa.Column('condition', sa.Text(), nullable=False),
+    sa.Column('expireTime', sa.DateTime(), nullable=False),
+    sa.Column('giveExpireTime', sa.DateTime(), nullable=False),
+    sa.Column('receiveExpireTime', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['storageGroupId'], ['storage_group.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('storage',
+    sa.Column('storageGroupId', sa.Integer(), nullable=False),
+    sa.Column('commodityId', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['commodityId'], ['commodity.id'], ),
+    sa.ForeignKeyConstraint(['storageGroupId'], ['storage_group.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('storage')
+    op.drop_table('commodity')
+    op.drop_table('storage_group')
+    op.drop_table('record')
+    op.drop_table('image')
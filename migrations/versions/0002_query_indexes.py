@@ -0,0 +1,139 @@
+"""query indexes and search and reputation tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from datetime import datetime
+from collections import Counter
+
+from alembic import op
+import sqlalchemy as sa
+
+from helpers.tokenizer import tokenize_batch, tokenizer_pool
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+INDEXES = [
+    ('commodity_term', 'ix_commodity_term_commodityId', ['commodityId']),
+    ('commodity_term', 'ix_commodity_term_term_commodityId', ['term', 'commodityId', 'frequency']),
+    ('commodity', 'ix_commodity_createdTime', ['createdTime']),
+    ('commodity', 'ix_commodity_giverId_createdTime', ['giverId', 'createdTime']),
+    ('commodity', 'ix_commodity_receiverId_createdTime', ['receiverId', 'createdTime']),
+    ('commodity', 'ix_commodity_status_expireTime', ['status', 'expireTime']),
+    ('commodity', 'ix_commodity_status_giveExpireTime', ['status', 'giveExpireTime']),
+    ('commodity', 'ix_commodity_status_receiveExpireTime', ['status', 'receiveExpireTime']),
+    ('commodity', 'ix_commodity_storageGroupId_createdTime', ['storageGroupId', 'createdTime']),
+    ('record', 'ix_record_createdTime', ['createdTime']),
+    ('record', 'ix_record_userId_reason', ['userId', 'reason', 'reward']),
+    ('storage', 'ix_storage_commodityId', ['commodityId']),
+    ('storage', 'ix_storage_createdTime', ['createdTime']),
+    ('storage', 'ix_storage_storageGroupId_commodityId', ['storageGroupId', 'commodityId']),
+    ('storage_group', 'ix_storage_group_createdTime', ['createdTime']),
+    ('storage_group', 'ix_storage_group_latitude_longitude', ['latitude', 'longitude']),
+]
+
+
+def backfill_user_reputation():
+    # summarize the records of the users that have none yet, which is every user on a database coming
+    # from the baseline schema
+    record = sa.table('record', sa.column('userId'), sa.column('reward'), sa.column('reason'))
+    user_reputation = sa.table(
+        'user_reputation', sa.column('userId'), sa.column('recordNum'), sa.column('rewardSum'),
+        sa.column('reportNum'), sa.column('createdTime'), sa.column('updatedTime'))
+    now = sa.literal(datetime.now(), sa.DateTime())
+
+    op.execute(user_reputation.insert().from_select(
+        ['userId', 'recordNum', 'rewardSum', 'reportNum', 'createdTime', 'updatedTime'],
+        sa.select(
+            record.c.userId,
+            sa.func.count(),
+            sa.func.sum(record.c.reward),
+            sa.func.sum(sa.case((record.c.reason == 'report', 1), else_=0)),
+            now,
+            now,
+        ).where(record.c.userId.not_in(sa.select(user_reputation.c.userId))).group_by(record.c.userId)
+    ))
+
+
+def backfill_commodity_term():
+    # index the commodities that have no postings yet, in batches of increasing id
+    connection = op.get_bind()
+    commodity = sa.table('commodity', sa.column('id'), sa.column('name'), sa.column('description'))
+    commodity_term = sa.table(
+        'commodity_term', sa.column('commodityId'), sa.column('term'), sa.column('frequency'),
+        sa.column('createdTime'), sa.column('updatedTime'))
+    now = datetime.now()
+
+    last_id = 0
+    with tokenizer_pool() as executor:
+        while True:
+            commodities = connection.execute(
+                sa.select(commodity.c.id, commodity.c.name, commodity.c.description).where(
+                    commodity.c.id > last_id, commodity.c.id.not_in(sa.select(commodity_term.c.commodityId))
+                ).order_by(commodity.c.id).limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not commodities:
+                return
+
+            texts = [f'{name} {description}' for _, name, description in commodities]
+            postings = [
+                {'commodityId': commodity_id, 'term': term, 'frequency': frequency,
+                 'createdTime': now, 'updatedTime': now}
+                for (commodity_id, _, _), terms in zip(commodities, tokenize_batch(texts, executor))
+                for term, frequency in Counter(terms).items()
+            ]
+            if postings:
+                connection.execute(commodity_term.insert(), postings)
+            last_id = commodities[-1].id
+
+
+def upgrade():
+    # every operation tolerates existing objects, databases created by db.create_all after some of
+    # these models were added are stamped at 0001 and then upgraded through here
+    op.create_table('user_reputation',
+    sa.Column('userId', sa.Text(), nullable=False),
+    sa.Column('recordNum', sa.Integer(), nullable=False),
+    sa.Column('rewardSum', sa.Integer(), nullable=False),
+    sa.Column('reportNum', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('userId'),
+    if_not_exists=True
+    )
+    op.create_table('commodity_term',
+    sa.Column('commodityId', sa.Integer(), nullable=False),
+    sa.Column('term', sa.Text(), nullable=False),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdTime', sa.DateTime(), nullable=False),
+    sa.Column('updatedTime', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['commodityId'], ['commodity.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+
+    for table_name, index_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False, if_not_exists=True)
+
+    backfill_user_reputation()
+    backfill_commodity_term()
+
+
+def downgrade():
+    for table_name, index_name, _ in reversed(INDEXES):
+        op.drop_index(index_name, table_name=table_name)
+
+    op.drop_table('commodity_term')
+    op.drop_table('user_reputation')
@@ -0,0 +1,32 @@
+"""updatedTime indexes for the list fingerprints
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 20:10:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('record', 'ix_record_updatedTime', ['updatedTime']),
+    ('storage', 'ix_storage_updatedTime', ['updatedTime']),
+    ('storage_group', 'ix_storage_group_updatedTime', ['updatedTime']),
+]
+
+
+def upgrade():
+    for table_name, index_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False)
+
+
+def downgrade():
+    for table_name, index_name, _ in reversed(INDEXES):
+        op.drop_index(index_name, table_name=table_name)
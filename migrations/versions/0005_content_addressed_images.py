@@ -0,0 +1,31 @@
+"""content addressed images
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # images uploaded before have no hash, each keeps its own file and its single reference
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('refCount', sa.Integer(), server_default='1', nullable=False))
+        batch_op.create_index('ix_image_hash', ['hash'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_index('ix_image_hash')
+        batch_op.drop_column('refCount')
+        batch_op.drop_column('hash')
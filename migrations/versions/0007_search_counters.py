@@ -0,0 +1,52 @@
+"""search corpus counters
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 22:30:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+COUNTERS = ['commodity_term.documentNum', 'commodity_term.termNum']
+
+commodity_term = sa.table(
+    'commodity_term',
+    sa.column('commodityId', sa.Integer),
+    sa.column('frequency', sa.Integer),
+)
+stat_counter = sa.table(
+    'stat_counter',
+    sa.column('name', sa.Text),
+    sa.column('value', sa.BigInteger),
+    sa.column('createdTime', sa.DateTime),
+    sa.column('updatedTime', sa.DateTime),
+)
+
+
+def upgrade():
+    # the postings written until now, from here on index_commodity keeps the counters
+    document_num, term_num = op.get_bind().execute(sa.select(
+        sa.func.count(sa.distinct(commodity_term.c.commodityId)), sa.func.sum(commodity_term.c.frequency)
+    )).one()
+
+    now = datetime.now()
+    op.execute(stat_counter.delete().where(stat_counter.c.name.in_(COUNTERS)))
+    op.bulk_insert(stat_counter, [
+        {'name': name, 'value': value or 0, 'createdTime': now, 'updatedTime': now}
+        for name, value in zip(COUNTERS, [document_num, term_num])
+    ])
+
+
+def downgrade():
+    op.execute(stat_counter.delete().where(stat_counter.c.name.in_(COUNTERS)))
@@ -1,10 +1,47 @@
 import json
 from datetime import datetime
-from models.database import SchemaMixin, db
+from functools import lru_cache
+
+from sqlalchemy import case
+from sqlalchemy.ext.hybrid import hybrid_property
+from werkzeug.http import parse_date
+
+from models.database import SchemaMixin, column_serializer, db
+
+LIVE_STATUSES = ['giving', 'receiving', 'pending', 'giveExpired', 'finished']
+
+# (statuses the rule applies to, deadline column, status once the deadline has passed), in priority order
+EXPIRY_RULES = [
+    (LIVE_STATUSES, 'expireTime', 'expired'),
+    (['giving'], 'giveExpireTime', 'giveExpired'),
+    (['receiving'], 'receiveExpireTime', 'pending'),
+]
+
+
+def resolve_status(status, deadlines, now):
+    """
+    The status a commodity stored as status is in at now, deadlines mapping the deadline columns to their times.
+
+    Resolving an already resolved status again gives the same result, so it can be applied to cached responses.
+    """
+    for statuses, deadline, target in EXPIRY_RULES:
+        if status in statuses and deadlines[deadline] and now > deadlines[deadline]:
+            return target
+
+    return status
 
 
 class Commodity(SchemaMixin, db.Model):
     __tablename__ = 'commodity'
+    __table_args__ = (
+        db.Index('ix_commodity_status_expireTime', 'status', 'expireTime'),
+        db.Index('ix_commodity_status_giveExpireTime', 'status', 'giveExpireTime'),
+        db.Index('ix_commodity_status_receiveExpireTime', 'status', 'receiveExpireTime'),
+        db.Index('ix_commodity_createdTime', 'createdTime'),
+        db.Index('ix_commodity_giverId_createdTime', 'giverId', 'createdTime'),
+        db.Index('ix_commodity_receiverId_createdTime', 'receiverId', 'createdTime'),
+        db.Index('ix_commodity_storageGroupId_createdTime', 'storageGroupId', 'createdTime'),
+    )
 
     giverId = db.Column(db.Text, nullable=False)
     receiverId = db.Column(db.Text, nullable=True)
@@ -24,17 +61,81 @@ class Commodity(SchemaMixin, db.Model):
     def __repr__(self):
         return f'<Commodity {self.name}>'
 
+    @classmethod
+    def expiry_conditions(cls, now):
+        return [
+            (cls.status.in_(statuses) & (getattr(cls, deadline) < now), target)
+            for statuses, deadline, target in EXPIRY_RULES
+        ]
+
+    @hybrid_property
+    def effectiveStatus(self):
+        deadlines = {deadline: getattr(self, deadline) for _, deadline, _ in EXPIRY_RULES}
+        return resolve_status(self.status, deadlines, datetime.now())
+
+    @effectiveStatus.expression
+    def effectiveStatus(cls):
+        return case(*cls.expiry_conditions(datetime.now()), else_=cls.status)
+
+    @classmethod
+    def effective_status_is(cls, status):
+        """
+        Filter on the effective status, narrowed to the stored statuses that can resolve to it so the
+        status indexes still apply.
+        """
+        sources = {status}
+        for statuses, _, target in EXPIRY_RULES:
+            if target == status:
+                sources.update(statuses)
+
+        return cls.status.in_(sources) & (cls.effectiveStatus == status)
+
     def to_dict(self):
-        dict_representation = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        dict_representation['updatedTime'] = dict_representation['updatedTime'].isoformat()
-        dict_representation['createdTime'] = dict_representation['createdTime'].isoformat()
+        dict_representation = column_serializer(Commodity)(self)
+        dict_representation.update(time_fields(dict_representation, datetime.now()))
         dict_representation['expireTime'] = dict_representation['expireTime'].isoformat()
-        dict_representation['images'] = json.loads(dict_representation['images'])
-        dict_representation['giveExpireSeconds'] = (
-                dict_representation['giveExpireTime'] - datetime.now()).total_seconds() \
-            if dict_representation['giveExpireTime'] else None
-        dict_representation['receiveExpireSeconds'] = (
-                dict_representation['receiveExpireTime'] - datetime.now()).total_seconds() \
-            if dict_representation['receiveExpireTime'] else None
+        dict_representation['images'] = list(parse_images(dict_representation['images']))
 
         return dict_representation
+
+    @staticmethod
+    def refresh_time_fields(data):
+        """
+        Recompute the fields of a serialized commodity that depend on the current time.
+        """
+        deadlines = {deadline: parse_time(data[deadline]) for _, deadline, _ in EXPIRY_RULES}
+        return {**data, **time_fields({**data, **deadlines}, datetime.now())}
+
+
+@lru_cache(maxsize=4096)
+def parse_images(images):
+    """
+    The image ids of the images column, memoized since many commodities share the same few lists.
+    """
+    return tuple(json.loads(images))
+
+
+def parse_time(value):
+    """
+    A datetime back from its serialized form, either ISO 8601 or the HTTP date the JSON provider writes.
+    """
+    if not isinstance(value, str):
+        return value
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parse_date(value).replace(tzinfo=None)
+
+
+def time_fields(commodity, now):
+    """
+    The status and seconds left before each deadline of a commodity given as a dict of its columns.
+    """
+    return {
+        'status': resolve_status(commodity['status'], commodity, now),
+        'giveExpireSeconds': (commodity['giveExpireTime'] - now).total_seconds()
+        if commodity['giveExpireTime'] else None,
+        'receiveExpireSeconds': (commodity['receiveExpireTime'] - now).total_seconds()
+        if commodity['receiveExpireTime'] else None,
+    }
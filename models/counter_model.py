@@ -0,0 +1,11 @@
+from models.database import SchemaMixin, db
+
+
+class StatCounter(SchemaMixin, db.Model):
+    __tablename__ = 'stat_counter'
+
+    name = db.Column(db.Text, nullable=False, unique=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StatCounter {self.name}>'
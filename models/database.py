@@ -1,8 +1,31 @@
-from flask_sqlalchemy import SQLAlchemy
+import threading
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 db = SQLAlchemy()
 
+# insert constructs of the dialects supporting INSERT ... ON CONFLICT
+UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+sqlite_writer_lock = threading.Lock()
+
 
 class SchemaMixin:
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -10,7 +33,102 @@ class SchemaMixin:
     updatedTime = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
     def to_dict(self):
-        dict_representation = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        dict_representation['updatedTime'] = dict_representation['updatedTime'].isoformat()
-        dict_representation['createdTime'] = dict_representation['createdTime'].isoformat()
-        return dict_representation
+        return column_serializer(type(self))(self)
+
+    @classmethod
+    def version(cls, *criteria):
+        """
+        Select the latest updatedTime and the number of rows matching criteria, which together change
+        whenever one of those rows is inserted, updated or deleted. The count reads every matching row,
+        whole tables are versioned by helpers.conditional.table_version instead.
+        """
+        return db.select(func.max(cls.updatedTime), func.count()).select_from(cls).filter(*criteria)
+
+
+@lru_cache(maxsize=None)
+def column_serializer(model, iso_columns=('createdTime', 'updatedTime')):
+    """
+    A function from an instance of model to the dict of its columns, with iso_columns as ISO 8601 strings.
+
+    The column names and accessors are resolved once per model here instead of reflecting over the table
+    for every row serialized. Loaded rows are read straight from the instance __dict__, skipping the
+    attribute instrumentation, and only expired or deferred ones go through getattr.
+    """
+    names = tuple(column.name for column in model.__table__.columns)
+    get_loaded = itemgetter(*names)
+    get_values = attrgetter(*names)
+    iso_indexes = [index for index, name in enumerate(names) if name in iso_columns]
+
+    def serialize(instance):
+        try:
+            values = list(get_loaded(instance.__dict__))
+        except KeyError:
+            values = list(get_values(instance))
+        for index in iso_indexes:
+            if values[index] is not None:
+                values[index] = values[index].isoformat()
+        return dict(zip(names, values))
+
+    return serialize
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    cursor.close()
+
+
+def begin_sqlite_savepoint(connection, name):
+    # pysqlite opens a transaction before the first write but none for SAVEPOINT, which would then be the
+    # outermost transaction and commit on RELEASE. BEGIN is only emitted here rather than for every
+    # transaction, so a request still takes its snapshot with its first write, after the writer lock
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+
+
+def acquire_sqlite_writer(session):
+    # the listeners are on the Session class shared by every app, only sessions of a SQLite app take the lock
+    if session.info.get('sqliteWriter') or session.get_bind().dialect.name != 'sqlite':
+        return
+
+    sqlite_writer_lock.acquire()
+    session.info['sqliteWriter'] = True
+
+
+def release_sqlite_writer(session, transaction):
+    if transaction.parent is None and session.info.pop('sqliteWriter', False):
+        sqlite_writer_lock.release()
+
+
+def acquire_sqlite_writer_on_flush(session, flush_context, instances):
+    acquire_sqlite_writer(session)
+
+
+def acquire_sqlite_writer_on_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        acquire_sqlite_writer(orm_execute_state.session)
+
+
+def init_sqlite(app):
+    """
+    Tune SQLite for a web workload and serialize the writers of this process.
+
+    Every connection runs in WAL mode, so readers keep reading the last committed snapshot while a
+    write is in progress instead of waiting for it. A savepoint begins the transaction it nests in.
+    A session takes sqlite_writer_lock on its first write and holds it until its transaction ends,
+    so request handlers and the expiry job queue up in-process instead of retrying on SQLITE_BUSY.
+    busy_timeout covers writers in other processes.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    event.listen(engine, 'connect', set_sqlite_pragmas)
+    event.listen(engine, 'savepoint', begin_sqlite_savepoint)
+    engine.dispose()
+
+    if app.config['SQLITE_SERIALIZE_WRITES'] and not event.contains(Session, 'before_flush', acquire_sqlite_writer_on_flush):
+        event.listen(Session, 'before_flush', acquire_sqlite_writer_on_flush)
+        event.listen(Session, 'do_orm_execute', acquire_sqlite_writer_on_execute)
+        event.listen(Session, 'after_transaction_end', release_sqlite_writer)
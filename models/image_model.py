@@ -3,9 +3,14 @@ from models.database import SchemaMixin, db
 
 class Image(SchemaMixin, db.Model):
     __tablename__ = 'image'
+    __table_args__ = (
+        db.Index('ix_image_hash', 'hash', unique=True),
+    )
 
     filename = db.Column(db.String(255), nullable=False)
     filepath = db.Column(db.String(255), nullable=False)
+    hash = db.Column(db.String(64), nullable=True)
+    refCount = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     def __repr__(self):
         return f'<Image {self.filename}>'
\ No newline at end of file
@@ -0,0 +1,28 @@
+from models.database import SchemaMixin, db
+
+
+class JobLock(SchemaMixin, db.Model):
+    __tablename__ = 'job_lock'
+
+    name = db.Column(db.Text, nullable=False, unique=True)
+    owner = db.Column(db.Text, nullable=False)
+    expireTime = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<JobLock {self.name}>'
+
+
+class JobMetric(SchemaMixin, db.Model):
+    __tablename__ = 'job_metric'
+
+    name = db.Column(db.Text, nullable=False, unique=True)
+    runNum = db.Column(db.Integer, nullable=False, default=0)
+    failureNum = db.Column(db.Integer, nullable=False, default=0)
+    lastStartTime = db.Column(db.DateTime, nullable=True)
+    lastDuration = db.Column(db.Float, nullable=True)
+    maxDuration = db.Column(db.Float, nullable=False, default=0.0)
+    totalDuration = db.Column(db.Float, nullable=False, default=0.0)
+    lastError = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<JobMetric {self.name}>'
@@ -5,6 +5,11 @@ from models.database import SchemaMixin, db
 
 class Record(SchemaMixin, db.Model):
     __tablename__ = 'record'
+    __table_args__ = (
+        db.Index('ix_record_userId_reason', 'userId', 'reason', 'reward'),
+        db.Index('ix_record_createdTime', 'createdTime'),
+        db.Index('ix_record_updatedTime', 'updatedTime'),
+    )
 
     userId = db.Column(db.Text, nullable=False)
     role = db.Column(db.Text, nullable=False)
@@ -15,3 +20,15 @@ class Record(SchemaMixin, db.Model):
     def __repr__(self):
         return f'<Record {self.reason}>'
 
+
+
+class UserReputation(SchemaMixin, db.Model):
+    __tablename__ = 'user_reputation'
+
+    userId = db.Column(db.Text, nullable=False, unique=True)
+    recordNum = db.Column(db.Integer, nullable=False, default=0)
+    rewardSum = db.Column(db.Integer, nullable=False, default=0)
+    reportNum = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserReputation {self.userId}>'
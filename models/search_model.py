@@ -0,0 +1,15 @@
+from models.database import SchemaMixin, db
+
+
+class CommodityTerm(SchemaMixin, db.Model):
+    __tablename__ = 'commodity_term'
+    __table_args__ = (
+        db.Index('ix_commodity_term_term_commodityId', 'term', 'commodityId', 'frequency'),
+    )
+
+    commodityId = db.Column(db.Integer, db.ForeignKey('commodity.id'), nullable=False, index=True)
+    term = db.Column(db.Text, nullable=False)
+    frequency = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<CommodityTerm {self.term}>'
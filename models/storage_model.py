@@ -1,8 +1,15 @@
-from models.database import SchemaMixin, db
+from sqlalchemy import case, func
+
+from models.database import SchemaMixin, column_serializer, db
 
 
 class StorageGroup(SchemaMixin, db.Model):
     __tablename__ = 'storage_group'
+    __table_args__ = (
+        db.Index('ix_storage_group_latitude_longitude', 'latitude', 'longitude'),
+        db.Index('ix_storage_group_createdTime', 'createdTime'),
+        db.Index('ix_storage_group_updatedTime', 'updatedTime'),
+    )
 
     name = db.Column(db.Text, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
@@ -12,18 +19,46 @@ class StorageGroup(SchemaMixin, db.Model):
     def __repr__(self):
         return f'<StorageGroup {self.name}>'
 
-    def to_dict(self):
-        dict_representation = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        dict_representation['updatedTime'] = dict_representation['updatedTime'].isoformat()
-        dict_representation['createdTime'] = dict_representation['createdTime'].isoformat()
-        dict_representation['storages'] = [storage.to_dict() for storage in self.storages]
-        dict_representation['total'] = len(self.storages)
-        dict_representation['available'] = sum([1 for storage in self.storages if not storage.commodityId])
+    @staticmethod
+    def availability(storage_group_ids):
+        """
+        Total and available storages of the given storage groups from one grouped aggregate,
+        answered from the (storageGroupId, commodityId) index.
+
+        :return: dict of storage group id to (total, available), groups without storages are left out
+        """
+        return {
+            storage_group_id: (total, available)
+            for storage_group_id, total, available in db.session.query(
+                Storage.storageGroupId,
+                func.count(),
+                func.sum(case((Storage.commodityId.is_(None), 1), else_=0))
+            ).filter(Storage.storageGroupId.in_(storage_group_ids)).group_by(Storage.storageGroupId)
+        }
+
+    def to_dict(self, with_storages=True, availability=None):
+        dict_representation = column_serializer(StorageGroup)(self)
+
+        if with_storages:
+            dict_representation['storages'] = [storage.to_dict() for storage in self.storages]
+            dict_representation['total'] = len(self.storages)
+            dict_representation['available'] = sum([1 for storage in self.storages if not storage.commodityId])
+            return dict_representation
+
+        if availability is None:
+            availability = StorageGroup.availability([self.id])
+        dict_representation['total'], dict_representation['available'] = availability.get(self.id, (0, 0))
         return dict_representation
 
 
 class Storage(SchemaMixin, db.Model):
     __tablename__ = 'storage'
+    __table_args__ = (
+        db.Index('ix_storage_storageGroupId_commodityId', 'storageGroupId', 'commodityId'),
+        db.Index('ix_storage_commodityId', 'commodityId'),
+        db.Index('ix_storage_createdTime', 'createdTime'),
+        db.Index('ix_storage_updatedTime', 'updatedTime'),
+    )
 
     storageGroupId = db.Column(db.Integer, db.ForeignKey('storage_group.id'), nullable=False)
     commodityId = db.Column(db.Integer, db.ForeignKey('commodity.id'), nullable=True)
@@ -0,0 +1,63 @@
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from app import create_app
+from models.database import db
+
+
+@pytest.fixture(scope='session')
+def postgres_url(tmp_path_factory):
+    # TEST_POSTGRES_URL points at a server of our own, otherwise pgserver spawns a local one
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if url:
+        yield url
+        return
+
+    pgserver = pytest.importorskip('pgserver')
+    server = pgserver.get_server(tmp_path_factory.mktemp('pgdata'), cleanup_mode='stop')
+    yield server.get_uri()
+    server.cleanup()
+
+
+@pytest.fixture
+def postgres_database(postgres_url):
+    name = f'test_{uuid.uuid4().hex}'
+    admin = create_engine(postgres_url, isolation_level='AUTOCOMMIT')
+    with admin.connect() as connection:
+        connection.exec_driver_sql(f'CREATE DATABASE {name}')
+    yield make_url(postgres_url).set(database=name).render_as_string(hide_password=False)
+
+    with admin.connect() as connection:
+        connection.exec_driver_sql(f'DROP DATABASE {name}')
+    admin.dispose()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path):
+    if request.param == 'postgresql':
+        return request.getfixturevalue('postgres_database')
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def app(database_url, tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'DATABASE_AUTO_UPGRADE': True,
+        'IMAGE_DIR': str(tmp_path / 'images'),
+    })
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,61 @@
+from models.commodity_model import Commodity
+from models.storage_model import Storage, db
+
+
+def commodity_input(storage_group_id=1):
+    return {
+        'giverId': 'donor',
+        'storageGroupId': storage_group_id,
+        'name': 'chair',
+        'description': 'a wooden chair',
+        'category': 'furniture',
+        'condition': 'used',
+        'images': [],
+    }
+
+
+def test_failed_items_roll_back_alone(app, client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    for _ in range(2):
+        client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+    missing_name = commodity_input()
+    del missing_name['name']
+    response = client.post('/api/commodity/commodities', json={'commodities': [
+        commodity_input(),
+        'chair',
+        commodity_input(storage_group_id=2),
+        missing_name,
+        commodity_input(),
+        # flushed before its storage claim fails, so only its savepoint is rolled back
+        commodity_input(),
+    ]})
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body['message'] == '2 of 6 commodities created'
+    assert [(result['status'], result['message']) for result in body['data']] == [
+        (201, 'Commodity created'),
+        (400, 'Invalid item'),
+        (404, 'Storage group not found'),
+        (400, "'name'"),
+        (201, 'Commodity created'),
+        (409, 'Storage group is full'),
+    ]
+
+    created_ids = [result['data']['id'] for result in body['data'] if result['status'] == 201]
+    with app.app_context():
+        assert [id_ for id_, in db.session.query(Commodity.id).order_by(Commodity.id)] == created_ids
+        assert sorted(id_ for id_, in db.session.query(Storage.commodityId)) == created_ids
+
+
+def test_every_item_created(client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+    response = client.post('/api/commodity/commodities', json={'commodities': [commodity_input()]})
+
+    assert response.status_code == 201
+    result, = response.get_json()['data']
+    assert result['status'] == 201
+    assert result['data']['storageGroupId'] == 1
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from helpers.commodity_lifecycle import GIVE_WINDOW, InvalidTransition, transition
+from models.commodity_model import Commodity
+from models.storage_model import Storage, db
+
+
+@pytest.fixture
+def commodity_id(client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+    response = client.post('/api/commodity/commodity', json={
+        'giverId': 'donor',
+        'storageGroupId': 1,
+        'name': 'chair',
+        'description': 'a wooden chair',
+        'category': 'furniture',
+        'condition': 'used',
+        'images': [],
+    })
+    return response.get_json()['data']['id']
+
+
+def test_invalid_transition_is_a_conflict(client, commodity_id):
+    response = client.patch(f'/api/commodity/commodity/{commodity_id}', json={'status': 'finished'})
+
+    assert response.status_code == 409
+    assert response.get_json()['data'] == {'status': 'giving'}
+
+
+def test_losing_a_transition_race_is_a_conflict(app, commodity_id):
+    with app.app_context():
+        commodity = db.session.get(Commodity, commodity_id)
+        assert commodity.effectiveStatus == 'giving'
+
+        # another request moves the commodity after this one read it
+        with app.app_context():
+            transition(db.session.get(Commodity, commodity_id), 'receiving')
+            db.session.commit()
+
+        with pytest.raises(InvalidTransition) as conflict:
+            transition(commodity, 'receiving')
+        db.session.rollback()
+
+    assert conflict.value.source == 'receiving'
+
+
+def test_giving_again_renews_the_give_window(app, commodity_id):
+    now = datetime.now()
+    with app.app_context():
+        commodity = db.session.get(Commodity, commodity_id)
+        commodity.giveExpireTime = now - timedelta(minutes=1)
+        db.session.commit()
+        assert commodity.effectiveStatus == 'giveExpired'
+
+        transition(commodity, 'giving', now=now)
+        db.session.commit()
+
+        commodity = db.session.get(Commodity, commodity_id)
+        assert commodity.giveExpireTime == now + GIVE_WINDOW
+        assert commodity.effectiveStatus == 'giving'
+
+
+def test_finishing_releases_the_storage(app, client, commodity_id):
+    with app.app_context():
+        assert db.session.query(Storage.commodityId).scalar() == commodity_id
+
+    client.patch(f'/api/commodity/commodity/{commodity_id}', json={'status': 'receiving', 'receiverId': 'receiver'})
+    client.patch(f'/api/commodity/commodity/{commodity_id}', json={'status': 'finished'})
+
+    with app.app_context():
+        assert db.session.query(Commodity.status).scalar() == 'finished'
+        assert db.session.query(Storage.commodityId).scalar() is None
@@ -0,0 +1,58 @@
+from helpers.counters import read_counters
+
+
+def post_storage_group(client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+
+def test_unchanged_list_is_not_modified(client):
+    post_storage_group(client)
+
+    response = client.get('/api/storage/storage')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+
+    response = client.get('/api/storage/storage', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+
+def test_list_etag_changes_with_every_write(app, client):
+    post_storage_group(client)
+    etags = [client.get('/api/storage/storage').headers['ETag']]
+
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+    etags.append(client.get('/api/storage/storage').headers['ETag'])
+
+    # a deletion moves no updatedTime, the deletion counter changes the ETag
+    client.delete('/api/storage/storage/3')
+    response = client.get('/api/storage/storage', headers={'If-None-Match': etags[-1]})
+    assert response.status_code == 200
+    etags.append(response.headers['ETag'])
+
+    assert len(set(etags)) == 3
+    with app.app_context():
+        assert read_counters('storage.deleteNum') == [1]
+
+
+def test_cascaded_deletions_are_counted(app, client):
+    post_storage_group(client)
+    etag = client.get('/api/storage/storage_group').headers['ETag']
+
+    client.delete('/api/storage/storage_group/1')
+
+    assert client.get('/api/storage/storage_group', headers={'If-None-Match': etag}).status_code == 200
+    with app.app_context():
+        assert read_counters('storage_group.deleteNum', 'storage.deleteNum') == [1, 2]
+
+
+def test_unchanged_item_is_not_modified(client):
+    post_storage_group(client)
+    etag = client.get('/api/storage/storage_group/1').headers['ETag']
+
+    assert client.get('/api/storage/storage_group/1', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+    assert client.get('/api/storage/storage_group/1', headers={'If-None-Match': etag}).status_code == 200
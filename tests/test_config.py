@@ -0,0 +1,19 @@
+from app import create_app
+from config import engine_options
+
+
+def test_in_memory_sqlite_takes_no_pool_size():
+    assert 'pool_size' not in engine_options('sqlite://')
+    assert 'pool_size' not in engine_options('sqlite:///:memory:')
+    assert 'pool_size' in engine_options('sqlite:///database.db')
+    assert 'pool_size' in engine_options('postgresql://localhost/taipeipass')
+
+
+def test_create_app_with_in_memory_sqlite():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'DATABASE_AUTO_UPGRADE': True})
+    client = app.test_client()
+
+    response = client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+
+    assert response.status_code == 201
+    assert client.get('/api/storage/storage_group').get_json()['data'][0]['name'] == 'group'
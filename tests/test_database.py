@@ -0,0 +1,14 @@
+from models.database import sqlite_writer_lock
+from models.storage_model import StorageGroup, db
+
+
+def test_only_sqlite_sessions_take_the_writer_lock(app):
+    with app.app_context():
+        db.session.add(StorageGroup(name='group', longitude=121.5, latitude=25.0))
+        db.session.flush()
+
+        assert sqlite_writer_lock.locked() == (db.engine.dialect.name == 'sqlite')
+
+        db.session.rollback()
+
+    assert not sqlite_writer_lock.locked()
@@ -0,0 +1,178 @@
+import io
+import time
+from pathlib import Path
+
+from PIL import Image as PILImage
+
+import helpers.image_store
+from helpers.image_pipeline import failure_path, missing_variants
+from helpers.image_store import prepare_stored_images
+from models.image_model import Image, db
+
+
+def store_legacy_file(app, name, write):
+    """
+    A file stored as an upload was before uploads were validated and variants generated.
+    """
+    path = Path(app.config['IMAGE_DIR']) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write(path)
+
+    with app.app_context():
+        image = Image(filename=name, filepath=str(path))
+        db.session.add(image)
+        db.session.commit()
+        return image.id, path
+
+
+def write_photo(path):
+    exif = PILImage.Exif()
+    exif[0x010f] = 'camera'
+    PILImage.new('RGB', (64, 48), (200, 30, 30)).save(path, format='JPEG', exif=exif)
+
+
+def write_text(path):
+    path.write_text('not an image')
+
+
+def test_legacy_image_is_served_without_its_metadata(app, client):
+    image_id, path = store_legacy_file(app, 'photo.jpg', write_photo)
+
+    response = client.get(f'/api/image/{image_id}', headers={'Accept': 'image/jpeg'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+
+    with PILImage.open(path.with_name('photo.full.jpg')) as served:
+        assert not served.getexif()
+
+
+def test_legacy_non_image_is_tried_once(app, client, monkeypatch):
+    image_id, path = store_legacy_file(app, 'notes.txt', write_text)
+
+    response = client.get(f'/api/image/{image_id}')
+    assert response.status_code == 415
+    assert failure_path(path).exists()
+
+    def process_image(*args):
+        raise AssertionError('a file that is not an image is processed again')
+
+    monkeypatch.setattr(helpers.image_store, 'process_image', process_image)
+    assert client.get(f'/api/image/{image_id}').status_code == 415
+
+
+def test_stored_images_skip_files_that_are_not_images(app):
+    _, text = store_legacy_file(app, 'notes.txt', write_text)
+    _, photo = store_legacy_file(app, 'photo.jpg', write_photo)
+
+    with app.app_context():
+        assert prepare_stored_images() == (1, 1)
+        assert prepare_stored_images() == (0, 0)
+
+    assert missing_variants(photo) == []
+    assert failure_path(text).exists()
+
+
+def png_bytes(color):
+    output = io.BytesIO()
+    PILImage.new('RGB', (32, 32), color).save(output, format='PNG')
+    return output.getvalue()
+
+
+def upload(client, content, name='image.png'):
+    return client.post('/api/image', data={'image': (io.BytesIO(content), name)})
+
+
+def stored_files(app):
+    """
+    The files under IMAGE_DIR, once the IMAGE_WORKERS pool has written the variants of every original.
+    """
+    deadline = time.monotonic() + 10
+    while True:
+        paths = [path for path in Path(app.config['IMAGE_DIR']).rglob('*') if path.is_file()]
+        originals = [path for path in paths if len(path.suffixes) == 1 and not path.name.startswith('.')]
+        if all(not missing_variants(path) for path in originals) or time.monotonic() > deadline:
+            return sorted(path.name for path in paths)
+        time.sleep(0.05)
+
+
+def test_identical_uploads_share_one_image(app, client):
+    first = upload(client, png_bytes('red'), 'a.png').get_json()['data']
+    second = upload(client, png_bytes('red'), 'b.png').get_json()['data']
+    other = upload(client, png_bytes('blue')).get_json()['data']
+
+    assert second['id'] == first['id'] != other['id']
+    assert second['refCount'] == 2
+    assert len([name for name in stored_files(app) if name.endswith('.png')]) == 2
+
+
+def test_batch_counts_every_copy(client):
+    response = client.post('/api/image/batch', data={'images': [
+        (io.BytesIO(png_bytes('red')), 'a.png'),
+        (io.BytesIO(png_bytes('red')), 'b.png'),
+        (io.BytesIO(b'not an image'), 'c.txt'),
+    ]})
+
+    assert response.status_code == 207
+    results = response.get_json()['data']
+    assert [result['status'] for result in results] == [201, 201, 415]
+    assert results[0]['data']['id'] == results[1]['data']['id']
+    assert results[1]['data']['refCount'] == 2
+
+
+def test_last_deletion_removes_the_files(app, client):
+    image_id = upload(client, png_bytes('red')).get_json()['data']['id']
+    upload(client, png_bytes('red'))
+    files = stored_files(app)
+
+    assert client.delete(f'/api/image/{image_id}').status_code == 204
+    assert client.get(f'/api/image/{image_id}').status_code == 200
+    assert stored_files(app) == files
+
+    assert client.delete(f'/api/image/{image_id}').status_code == 204
+    assert client.get(f'/api/image/{image_id}').status_code == 404
+    assert stored_files(app) == []
+
+
+def test_variant_is_served_in_ranges_and_cached_for_good(client):
+    image_id = upload(client, png_bytes('red')).get_json()['data']['id']
+
+    response = client.get(f'/api/image/{image_id}', headers={'Accept': 'image/webp'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert response.headers['Vary'] == 'Accept'
+    assert response.cache_control.immutable
+    body, etag = response.get_data(), response.headers['ETag']
+
+    response = client.get(f'/api/image/{image_id}', headers={'Accept': 'image/webp', 'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 0-9/{len(body)}'
+    assert response.get_data() == body[:10]
+
+    response = client.get(f'/api/image/{image_id}', headers={'Accept': 'image/webp', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_sendfile_mode_leaves_the_bytes_to_the_server(app, client):
+    image_id = upload(client, png_bytes('red')).get_json()['data']['id']
+    app.config['IMAGE_SENDFILE'] = 'x-accel'
+
+    response = client.get(f'/api/image/{image_id}', headers={'Accept': 'image/jpeg'})
+    assert response.status_code == 200
+    assert response.get_data() == b''
+
+    location = response.headers['X-Accel-Redirect']
+    assert location.startswith(app.config['IMAGE_ACCEL_PREFIX'].rstrip('/') + '/')
+    assert location.endswith('.full.jpg')
+    assert (Path(app.config['IMAGE_DIR']) / location.split('/', 2)[2]).exists()
+
+
+def test_lookup_is_served_from_memory(app, client):
+    image_id = upload(client, png_bytes('red')).get_json()['data']['id']
+    assert client.get(f'/api/image/{image_id}').status_code == 200
+
+    # within IMAGE_LOOKUP_TTL the path comes from the LRU, the row is not read again
+    with app.app_context():
+        db.session.query(Image).filter(Image.id == image_id).update({'filepath': 'moved.png'})
+        db.session.commit()
+
+    assert client.get(f'/api/image/{image_id}').status_code == 200
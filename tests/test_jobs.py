@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from helpers.jobs import JobWorker, acquire_lock, job_metrics, release_lock
+
+LEASE_SECONDS = 30
+WORKER_NUM = 8
+
+
+def test_lease_is_taken_over_once_expired(app):
+    now = datetime.now()
+
+    with app.app_context():
+        assert acquire_lock('job', 'a', LEASE_SECONDS, now)
+        assert not acquire_lock('job', 'b', LEASE_SECONDS, now + timedelta(seconds=10))
+        assert acquire_lock('job', 'a', LEASE_SECONDS, now + timedelta(seconds=20))
+
+        # a renewed at 20s, its lease runs until 50s
+        assert not acquire_lock('job', 'b', LEASE_SECONDS, now + timedelta(seconds=40))
+        assert acquire_lock('job', 'b', LEASE_SECONDS, now + timedelta(seconds=60))
+        assert not acquire_lock('job', 'a', LEASE_SECONDS, now + timedelta(seconds=70))
+
+
+def test_released_lease_is_taken_over_at_once(app):
+    with app.app_context():
+        assert acquire_lock('job', 'a', LEASE_SECONDS)
+        release_lock('job', 'a')
+        assert acquire_lock('job', 'b', LEASE_SECONDS)
+
+
+def test_one_of_racing_workers_takes_the_lease(app):
+    def acquire(owner):
+        with app.app_context():
+            return acquire_lock('job', owner, LEASE_SECONDS)
+
+    with ThreadPoolExecutor(max_workers=WORKER_NUM) as executor:
+        acquired = list(executor.map(acquire, [f'worker{index}' for index in range(WORKER_NUM)]))
+
+    assert acquired.count(True) == 1
+
+
+def test_only_the_leader_runs_jobs(app):
+    runs = []
+    leader, follower = JobWorker(app, blocking=False), JobWorker(app, blocking=False)
+    leader.renew_lease()
+    follower.renew_lease()
+
+    for worker in (leader, follower):
+        worker.run('job', lambda app_: runs.append(worker.owner))
+    assert runs == [leader.owner]
+
+    # the leader stopping hands the lease over on the next renewal
+    leader.stop()
+    follower.renew_lease()
+    follower.run('job', lambda app_: runs.append(follower.owner))
+    assert runs == [leader.owner, follower.owner]
+
+    with app.app_context():
+        assert job_metrics()['job']['runNum'] == 2
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from models.storage_model import StorageGroup, db
+
+
+def collect_pages(client, url):
+    ids, cursor = [], None
+    while True:
+        body = client.get(url, query_string={'limit': 2, **({'cursor': cursor} if cursor else {})}).get_json()
+        ids += [item['id'] for item in body['data']]
+        cursor = body['nextCursor']
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip(client):
+    for index in range(5):
+        client.post('/api/storage/storage_group', json={'name': f'group{index}', 'longitude': 121.5, 'latitude': 25.0})
+
+    assert collect_pages(client, '/api/storage/storage_group') == [1, 2, 3, 4, 5]
+
+
+def test_cursor_breaks_created_time_ties_by_id(app, client):
+    created_time = datetime(2024, 1, 1)
+    with app.app_context():
+        db.session.add_all([
+            StorageGroup(name=f'group{index}', longitude=121.5, latitude=25.0, createdTime=created_time)
+            for index in range(5)
+        ])
+        db.session.commit()
+
+    assert collect_pages(client, '/api/storage/storage_group') == [1, 2, 3, 4, 5]
+
+
+def test_malformed_cursor_is_a_bad_request(client):
+    response = client.get('/api/storage/storage_group', query_string={'cursor': 'not-a-cursor'})
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid cursor not-a-cursor'
@@ -0,0 +1,33 @@
+import pytest
+
+from helpers.query_plan import check_query_plans, full_scans
+
+FIRST_PAGE = 'SELECT record.id FROM record ORDER BY record."createdTime", record.id LIMIT ? OFFSET ?'
+FINGERPRINT = 'SELECT (SELECT count(*) AS count_1 FROM record) AS anon_1'
+
+
+@pytest.mark.parametrize('statement, detail, scans', [
+    (FINGERPRINT, 'SCAN record', True),
+    (FINGERPRINT, 'SCAN record USING COVERING INDEX ix_record_updatedTime', True),
+    (FINGERPRINT, 'SEARCH record USING COVERING INDEX ix_record_updatedTime', False),
+    (FINGERPRINT, 'SEARCH record USING INDEX ix_record_userId_reason (userId=?)', False),
+    (FINGERPRINT, 'SCAN CONSTANT ROW', False),
+    (FIRST_PAGE, 'SCAN record USING INDEX ix_record_createdTime', False),
+    (FIRST_PAGE.replace('ORDER BY', 'WHERE record.reward > ? ORDER BY'), 'SCAN record USING INDEX ix_record_createdTime', True),
+    (FIRST_PAGE, 'SCAN record', True),
+])
+def test_full_scans(statement, detail, scans):
+    assert full_scans(statement, [detail]) == ([detail] if scans else [])
+
+
+def test_sorting_a_first_page_scans_the_table():
+    details = ['SCAN record USING INDEX ix_record_userId_reason', 'USE TEMP B-TREE FOR ORDER BY']
+
+    assert full_scans(FIRST_PAGE, details) == details[:1]
+
+
+def test_api_queries_scan_no_whole_table(app):
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        pytest.skip('query plans are checked on SQLite')
+
+    assert check_query_plans(app) == []
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.reputation import rebuild_reputations
+from models.record_model import UserReputation, db
+
+POSTER_NUM = 4
+RECORD_NUM = 25
+
+
+def record_input(user_id, reason='thanks'):
+    return {'userId': user_id, 'role': 'giver', 'commodityId': 1, 'reward': 4, 'reason': reason}
+
+
+def test_rebuild_repairs_a_drifted_summary(app, client):
+    client.post('/api/record/record', json=record_input('alice'))
+    client.post('/api/record/record', json=record_input('alice', reason='report'))
+    client.post('/api/record/record', json=record_input('bob'))
+
+    with app.app_context():
+        db.session.query(UserReputation).filter(UserReputation.userId == 'bob').delete()
+        db.session.add(UserReputation(userId='carol', recordNum=3, rewardSum=9, reportNum=0))
+        db.session.commit()
+
+        assert rebuild_reputations() == ['bob', 'carol']
+        assert rebuild_reputations() == []
+
+    assert client.get('/api/record/record/alice').get_json()['data'] == {
+        'recordNum': 2, 'meanReward': 4.0, 'reportNum': 1, 'evaluation': 'bad'}
+
+
+def test_records_posted_during_a_rebuild_are_kept(app):
+    def post_records(poster):
+        client = app.test_client()
+        for _ in range(RECORD_NUM):
+            client.post('/api/record/record', json=record_input(f'user{poster}'))
+
+    with ThreadPoolExecutor(max_workers=POSTER_NUM) as executor:
+        posters = [executor.submit(post_records, poster) for poster in range(POSTER_NUM)]
+        with app.app_context():
+            while not all(poster.done() for poster in posters):
+                rebuild_reputations()
+                db.session.remove()
+
+    with app.app_context():
+        assert dict(db.session.query(UserReputation.userId, UserReputation.recordNum)) == {
+            f'user{poster}': RECORD_NUM for poster in range(POSTER_NUM)}
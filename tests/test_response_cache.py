@@ -0,0 +1,70 @@
+import pytest
+
+from app import create_app
+from helpers.response_cache import invalidate_on_commit
+from models.database import db
+
+
+@pytest.fixture
+def cached_app(database_url, tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'DATABASE_AUTO_UPGRADE': True,
+        'IMAGE_DIR': str(tmp_path / 'images'),
+        'RESPONSE_CACHE_URL': 'memory://',
+    })
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(cached_app):
+    client = cached_app.test_client()
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    return client
+
+
+def test_repeated_get_is_served_from_the_cache(client):
+    first = client.get('/api/storage/storage_group/1')
+    second = client.get('/api/storage/storage_group/1')
+
+    assert [first.headers['X-Cache'], second.headers['X-Cache']] == ['MISS', 'HIT']
+    assert second.get_json() == first.get_json()
+
+    metrics = client.get('/api/metrics/cache').get_json()['data']
+    assert metrics['storage.get_storage_group'] == {'hits': 1, 'misses': 1, 'hitRate': 0.5}
+
+
+def test_write_invalidates_the_namespace(client):
+    client.get('/api/storage/storage_group/1')
+    client.patch('/api/storage/storage_group/1', json={'name': 'renamed'})
+
+    response = client.get('/api/storage/storage_group/1')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['data']['name'] == 'renamed'
+
+
+def test_failed_write_keeps_the_entries(client):
+    client.get('/api/storage/storage_group/1')
+
+    assert client.patch('/api/storage/storage_group/2', json={'name': 'renamed'}).status_code == 404
+    assert client.get('/api/storage/storage_group/1').headers['X-Cache'] == 'HIT'
+
+
+def test_invalidation_waits_for_the_commit(cached_app):
+    cache = cached_app.extensions['response_cache']
+
+    with cached_app.app_context():
+        version = cache.version('storage')
+        invalidate_on_commit('storage')
+        db.session.rollback()
+        assert cache.version('storage') == version
+
+        invalidate_on_commit('storage')
+        assert cache.version('storage') == version
+        db.session.commit()
+        assert cache.version('storage') == version + 1
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from models.commodity_model import Commodity, db
+from tests.test_search_index import post_commodity, searched_names
+
+
+@pytest.fixture
+def fts_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'DATABASE_AUTO_UPGRADE': True,
+        'IMAGE_DIR': str(tmp_path / 'images'),
+        'SEARCH_BACKEND': 'fts5',
+    })
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_triggers_mirror_commodity_writes(fts_app):
+    client = fts_app.test_client()
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    for _ in range(2):
+        client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+    post_commodity(client, '木頭椅子', '可以坐的椅子')
+    post_commodity(client, '書桌', '很大的書桌')
+    assert searched_names(client, '椅子') == ['木頭椅子']
+
+    client.patch('/api/commodity/commodity/2', json={'description': '附一張椅子'})
+    assert searched_names(client, '椅子') == ['木頭椅子', '書桌']
+    assert searched_names(client, '很大') == []
+
+    with fts_app.app_context():
+        db.session.delete(db.session.get(Commodity, 1))
+        db.session.commit()
+
+    assert searched_names(client, '椅子') == ['書桌']
+
+
+def test_existing_commodities_are_indexed_on_start(fts_app, tmp_path):
+    client = fts_app.test_client()
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    client.post('/api/storage/storage', json={'storageGroupId': 1})
+    post_commodity(client, '檯燈', '桌上的檯燈')
+
+    with fts_app.app_context():
+        db.session.execute(text('DELETE FROM commodity_fts'))
+        db.session.commit()
+        db.engine.dispose()
+
+    restarted = create_app(dict(fts_app.config))
+    assert searched_names(restarted.test_client(), '檯燈') == ['檯燈']
@@ -0,0 +1,62 @@
+from sqlalchemy import func
+
+from helpers.search_index import corpus_statistics, rebuild_index
+from models.search_model import CommodityTerm, db
+
+
+def post_commodity(client, name, description):
+    return client.post('/api/commodity/commodity', json={
+        'giverId': 'donor',
+        'storageGroupId': 1,
+        'name': name,
+        'description': description,
+        'category': 'furniture',
+        'condition': 'used',
+        'images': [],
+    })
+
+
+def summed_statistics():
+    document_num, term_num = db.session.query(
+        func.count(func.distinct(CommodityTerm.commodityId)), func.sum(CommodityTerm.frequency)).one()
+    return document_num, term_num / document_num
+
+
+def test_corpus_counters_follow_the_postings(app, client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    for _ in range(3):
+        client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+    post_commodity(client, '木頭椅子', '可以坐的椅子')
+    post_commodity(client, '書桌', '很大的木頭書桌')
+    post_commodity(client, '檯燈', '')
+    client.patch('/api/commodity/commodity/1', json={'description': '可以坐的木頭椅子，附椅墊'})
+
+    with app.app_context():
+        assert corpus_statistics() == summed_statistics()
+
+        assert rebuild_index() == 3
+        assert corpus_statistics() == summed_statistics()
+
+
+def searched_names(client, keyword):
+    response = client.get('/api/commodity/commodity', query_string={'keyword': keyword})
+    return [commodity['name'] for commodity in response.get_json()['data']]
+
+
+def test_keyword_search_ranks_with_bm25(client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    for _ in range(4):
+        client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+    post_commodity(client, '椅子', '椅子 椅子 木頭')
+    post_commodity(client, '凳子', '木頭 椅子')
+    post_commodity(client, '書桌', '木頭 書桌 抽屜 檯燈 椅子 沙發 衣櫃 床墊')
+    post_commodity(client, '檯燈', '檯燈')
+
+    # the term repeated ranks first, the longer description of the same frequency last
+    assert searched_names(client, '椅子') == ['椅子', '凳子', '書桌']
+    # the rarer term weighs more than the one in almost every description
+    assert searched_names(client, '木頭 檯燈')[:2] == ['檯燈', '書桌']
+    assert searched_names(client, '沙發') == ['書桌']
+    assert searched_names(client, '冰箱') == []
@@ -0,0 +1,51 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from models.commodity_model import Commodity
+from models.storage_model import Storage, db
+
+DONOR_NUM = 60
+STORAGE_NUM = 20
+THREAD_NUM = 12
+
+
+def commodity_input(index):
+    return {
+        'giverId': f'donor{index}',
+        'storageGroupId': 1,
+        'name': 'chair',
+        'description': 'a wooden chair',
+        'category': 'furniture',
+        'condition': 'used',
+        'images': [],
+    }
+
+
+def test_concurrent_donors_never_share_a_storage(app, client):
+    client.post('/api/storage/storage_group', json={'name': 'group', 'longitude': 121.5, 'latitude': 25.0})
+    for _ in range(STORAGE_NUM):
+        client.post('/api/storage/storage', json={'storageGroupId': 1})
+
+    start = threading.Barrier(THREAD_NUM)
+
+    def donate(indexes):
+        start.wait()
+        donor = app.test_client()
+        return [donor.post('/api/commodity/commodity', json=commodity_input(index)) for index in indexes]
+
+    with ThreadPoolExecutor(max_workers=THREAD_NUM) as executor:
+        batches = executor.map(donate, [range(thread, DONOR_NUM, THREAD_NUM) for thread in range(THREAD_NUM)])
+        responses = [response for batch in batches for response in batch]
+
+    assert Counter(response.status_code for response in responses) == {201: STORAGE_NUM, 409: DONOR_NUM - STORAGE_NUM}
+
+    with app.app_context():
+        claims = [commodity_id for commodity_id, in db.session.query(Storage.commodityId)]
+        commodity_ids = {commodity_id for commodity_id, in db.session.query(Commodity.id)}
+
+    assert None not in claims
+    assert len(set(claims)) == len(claims)
+    # the commodities of the donors that got 409 were rolled back with their failed claim
+    assert set(claims) == commodity_ids
+    assert commodity_ids == {response.get_json()['data']['id'] for response in responses if response.status_code == 201}